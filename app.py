@@ -1,6 +1,6 @@
 import streamlit as st
-import copy
 import json
+import zipfile
 
 import objs.plan 
 import utils.utilities
@@ -67,15 +67,23 @@ st.button('Load Plan',on_click=load_plan,use_container_width=True)
 
 if st.session_state['load_file'] is not None:
     try:
-        raw_bytes = st.session_state['load_file'].getvalue()
-        raw_text = raw_bytes.decode('utf-8').strip()
-        if raw_text == '':
-            raise json.JSONDecodeError("Empty file", raw_text, 0)
-        payload = json.loads(raw_text)
-        st.session_state['plan'] = copy.deepcopy(utils.utilities.json_to_plan(payload))
+        # Heavy attributes (tax frames, amortization tables, ...) load when a page first uses
+        # them, and the freshly loaded plan is not shared, so it isn't copied
+        if st.session_state['load_file'].name.endswith('.npz'):
+            # Binary plan bundle (Plan.save)
+            st.session_state['plan'] = objs.plan.Plan.load(st.session_state['load_file'],lazy=True)
+        else:
+            raw_bytes = st.session_state['load_file'].getvalue()
+            raw_text = raw_bytes.decode('utf-8').strip()
+            if raw_text == '':
+                raise json.JSONDecodeError("Empty file", raw_text, 0)
+            st.session_state['plan'] = utils.utilities.json_to_plan(raw_text,lazy=True)
         st.session_state['plan_updated'] = True
         st.session_state['plan_saved'] = True
         utils.ui_functions.make_sidebar()
     except json.JSONDecodeError as exc:
         st.error(f"Could not load plan: invalid JSON ({exc.msg}).")
         st.session_state['load_file'] = None
+    except (ValueError, KeyError, OSError, zipfile.BadZipFile) as exc:
+        st.error(f"Could not load plan: {exc}")
+        st.session_state['load_file'] = None
@@ -0,0 +1,147 @@
+"""
+Equivalence check: utils.utilities.expand_contract against _expand_contract_general.
+
+expand_contract takes a vectorized path for int64-indexed int64/float64 series and falls
+back to _expand_contract_general (the element-by-element implementation it replaced)
+for everything else. This runs both on randomized inputs: int, float, int32, bool,
+NaN-holding and object series with gapped, shuffled and duplicate year indexes,
+calendars that prune or need front/back padding, assorted pad values, series already
+aligned to the calendar, and scalars and other non-series inputs. Values, index,
+dtype and raised exceptions must all match. Prints the number of cases, mismatches
+and aligned inputs returned unchanged, and exits with status 1 on any mismatch. Run
+from the repository root:
+
+    python benchmarks/expand_contract_equivalence.py [cases] [seed]
+"""
+
+import os
+import random
+import sys
+import warnings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+import pandas as pd
+
+from utils.utilities import expand_contract, _expand_contract_general
+
+SERIES_KINDS = ['int', 'float', 'int32', 'bool', 'nan', 'object']
+SCALARS = [3, 0.25, np.int64(4), np.float64(0.03), np.int32(2), True, 'str', None, [1, 2]]
+PAD_VALS = [[0, 0], [1.5, 2], [np.int64(3), 0.0], [True, 0], [-1, np.float64(2.5)]]
+
+
+def random_series(rng):
+    """A series of a random kind over random years (some gapped, shuffled or duplicated)."""
+    kind = rng.choice(SERIES_KINDS)
+    first = rng.randint(1990, 2080)
+    years = list(range(first, first + rng.randint(1, 60)))
+    if rng.random() < 0.4:
+        years = sorted(rng.sample(years, max(1, int(len(years) * rng.uniform(0.3, 1)))))
+    if rng.random() < 0.2:
+        rng.shuffle(years)
+    if rng.random() < 0.03 and len(years) > 1:
+        years[-1] = years[0]
+    values = [rng.randint(-1000, 100000) for _ in years]
+    if kind == 'int':
+        series = pd.Series(values, index=years)
+    elif kind == 'float':
+        series = pd.Series([value / 7 for value in values], index=years)
+    elif kind == 'int32':
+        series = pd.Series(np.array(values, dtype=np.int32), index=years)
+    elif kind == 'bool':
+        series = pd.Series([value % 2 == 0 for value in values], index=years)
+    elif kind == 'nan':
+        series = pd.Series([np.nan if value % 5 == 0 else value * 0.5 for value in values], index=years)
+    else:
+        series = pd.Series([str(value) for value in values], index=years)
+    if rng.random() < 0.1:
+        series.name = 'x'
+    return(series)
+
+
+def random_cal_year(rng):
+    """A plan calendar (sometimes a slice not starting at label 0)."""
+    first = rng.randint(2000, 2060)
+    n_years = rng.randint(1, 50)
+    cal_year = pd.Series(range(first, first + n_years))
+    return(cal_year.loc[rng.randint(0, n_years - 1):] if rng.random() < 0.3 else cal_year)
+
+
+def random_case(rng):
+    """(input, cal_year, keyword arguments) for one expand_contract call."""
+    cal_year = random_cal_year(rng)
+    if rng.random() < 0.85:
+        value = random_series(rng)
+        if rng.random() < 0.2:
+            # Already aligned to the calendar
+            value = pd.Series(np.arange(len(cal_year)) * rng.choice([1, 1.5]), index=list(range(int(min(cal_year)), int(max(cal_year)) + 1)))
+    else:
+        value = rng.choice(SCALARS)
+    kwargs = {'val_pad_front': rng.random() < 0.5, 'val_pad_back': rng.random() < 0.5, 'pad_vals': rng.choice(PAD_VALS)}
+    return(value, cal_year, kwargs)
+
+
+def run(function, *args, **kwargs):
+    """('ok', result) or ('error', exception type name)."""
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            return(('ok', function(*args, **kwargs)))
+    except Exception as error:
+        return(('error', type(error).__name__))
+
+
+def same_result(expected, actual):
+    """Whether two run() results match in outcome, values, index and dtype."""
+    if expected[0] != actual[0]:
+        return(False)
+    if expected[0] == 'error':
+        return(expected[1] == actual[1])
+    expected, actual = expected[1], actual[1]
+    if not isinstance(expected, pd.Series):
+        return(expected is actual or expected == actual)
+    return(isinstance(actual, pd.Series)
+           and expected.dtype == actual.dtype
+           and expected.index.dtype == actual.index.dtype
+           and list(expected.index) == list(actual.index)
+           and (expected.equals(actual) or (expected.dtype == object and repr(expected) == repr(actual))))
+
+
+def describe(value):
+    """Short description of an input for mismatch reports."""
+    if isinstance(value, pd.Series):
+        return(f'Series({value.dtype}, {len(value)} years from {list(value.index)[:3]})')
+    return(repr(value))
+
+
+def describe_result(result):
+    """Short description of a run() result for mismatch reports."""
+    if result[0] == 'ok' and isinstance(result[1], pd.Series):
+        series = result[1]
+        return(f'Series({series.dtype}, index {series.index.dtype} {list(series.index)[:3]}, values {list(series)[:3]})')
+    return(f'{result[0]} {result[1]!r}')
+
+
+if __name__ == '__main__':
+    n_cases = int(sys.argv[1]) if len(sys.argv) > 1 else 30000
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    rng = random.Random(seed)
+    mismatches = 0
+    unchanged = 0
+    for _ in range(n_cases):
+        value, cal_year, kwargs = random_case(rng)
+        expected = run(_expand_contract_general, value.copy() if hasattr(value, 'copy') else value, cal_year, **kwargs)
+        actual = run(expand_contract, value, cal_year, **kwargs)
+        if isinstance(value, pd.Series) and actual[0] == 'ok' and actual[1] is value:
+            unchanged += 1
+        if not same_result(expected, actual):
+            mismatches += 1
+            if mismatches <= 5:
+                print(f'  mismatch: {describe(value)}, calendar {int(min(cal_year))}-{int(max(cal_year))}, {kwargs}')
+                print(f'    expected {describe_result(expected)}')
+                print(f'    got      {describe_result(actual)}')
+    print(f'{n_cases} cases (seed {seed}), {mismatches} mismatches, {unchanged} aligned inputs returned unchanged')
+    if mismatches > 0:
+        sys.exit(1)
@@ -0,0 +1,82 @@
+"""
+Import-time budget: wall time of `import objs.plan` in a fresh interpreter.
+
+Each run starts a new Python process outside the repository (so relative data paths
+can't be relied on), imports objs.plan and checks that no data files were read and
+that no plotting modules (plotly, utils.plotting) were loaded: the core engine must
+import headless. Prints the best and median of the runs and the slowest modules from
+`python -X importtime`, and exits with status 1 if the best run is over budget or
+either check fails:
+
+    python benchmarks/import_time.py [runs] [budget_seconds]
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Seconds for `import objs.plan` (best of the runs)
+IMPORT_BUDGET = 1.0
+
+# Modules the core engine must not import
+PLOTTING_MODULES = ['plotly', 'utils.plotting', 'seaborn', 'matplotlib']
+
+IMPORT_SCRIPT = '''
+import sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+import objs.plan
+elapsed = time.perf_counter() - start
+import utils.resources
+plotting = [name for name in {modules!r} if name in sys.modules]
+print(elapsed, len(utils.resources.loaded_resources()), ','.join(plotting) or '-')
+'''
+
+
+def time_import(runs):
+    """Seconds per `import objs.plan` in fresh processes, the data files read and the plotting modules loaded."""
+    timings = []
+    loaded = 0
+    plotting = set()
+    with tempfile.TemporaryDirectory() as cwd:
+        for _ in range(runs):
+            out = subprocess.run([sys.executable, '-c', IMPORT_SCRIPT.format(root=ROOT, modules=PLOTTING_MODULES)], cwd=cwd,
+                                 capture_output=True, text=True, check=True).stdout.split()
+            timings.append(float(out[0]))
+            loaded = max(loaded, int(out[1]))
+            plotting |= set(out[2].split(',')) - set(['-'])
+    return(timings, loaded, sorted(plotting))
+
+
+def slowest_modules(n=8):
+    """(cumulative microseconds, module) for the top-level imports under objs.plan, slowest first."""
+    with tempfile.TemporaryDirectory() as cwd:
+        err = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import sys; sys.path.insert(0, {ROOT!r}); import objs.plan'],
+                             cwd=cwd, capture_output=True, text=True, check=True).stderr
+    rows = []
+    for line in err.splitlines():
+        parts = line.split('|')
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            name = parts[2].rstrip()
+            # Only modules imported directly by the local packages (two-space nesting)
+            if len(name) - len(name.lstrip()) <= 3:
+                rows.append((int(parts[1]), name.strip()))
+    return(sorted(rows, reverse=True)[:n])
+
+
+if __name__ == '__main__':
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    budget = float(sys.argv[2]) if len(sys.argv) > 2 else IMPORT_BUDGET
+    timings, loaded, plotting = time_import(runs)
+    best = min(timings)
+    print(f'import objs.plan: best {best:.3f} s, median {statistics.median(timings):.3f} s over {runs} runs (budget {budget:.3f} s)')
+    print(f'data files read at import: {loaded}')
+    print(f'plotting modules loaded at import: {", ".join(plotting) or "none"}')
+    for microseconds, name in slowest_modules():
+        print(f'  {microseconds/1e6:7.3f} s  {name}')
+    if best > budget or loaded > 0 or len(plotting) > 0:
+        sys.exit(1)
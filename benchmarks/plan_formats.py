@@ -0,0 +1,116 @@
+"""
+Saved plan formats: JSON (Plan.save to .json) against the binary bundle (Plan.save to .npz).
+
+Builds sample plans (the tax benchmark plan, balanced, and the same plan with forty
+extra expenses), saves and loads each in both formats and prints file
+sizes and the best save and load times. Also checks the round trips: the two formats
+must load the same plan, except for DataFrames the JSON format can't hold (repeated
+index values, the per-filer tax frames), which the bundle must load as they were
+saved. Exits with status 1 if a check fails. Run from the repository root:
+
+    python benchmarks/plan_formats.py [repeats]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from tax_per_filer import build_plan
+
+import objs.plan
+import objs.financial_objects as fo
+
+OBJECT_LISTS = ['people', 'income', 'expenses', 'assets', 'liabilities']
+
+
+def sample_plans():
+    """(name, plan) for each sample plan, balanced."""
+    plan = build_plan()
+    yield 'benchmark', plan.balance_and_tax()
+    plan = build_plan()
+    for i in range(40):
+        expense = fo.ExpenseObj(plan.people[i % 2].id, 'Discretionary', 'Other', f'Expense {i}', '', plan.cal_year, 500 + 50*i, False, True, {'infl_rate': plan.col_rate})
+        plan.expenses.append(expense)
+        plan = expense.project(plan)
+    yield 'extra expenses', plan.balance_and_tax()
+
+
+def differences(a, b, path=''):
+    """Paths where a and b differ (Series and DataFrames compared exactly)."""
+    if isinstance(a, (pd.Series, pd.DataFrame)):
+        if type(a) is not type(b):
+            return([path])
+        try:
+            if isinstance(a, pd.Series):
+                pd.testing.assert_series_equal(a, b, check_exact=True)
+            else:
+                pd.testing.assert_frame_equal(a, b, check_exact=True)
+        except AssertionError:
+            return([path])
+        return([])
+    if isinstance(a, dict):
+        if not isinstance(b, dict) or list(a) != list(b):
+            return([path])
+        return([diff for key in a for diff in differences(a[key], b[key], f'{path}/{key}')])
+    if isinstance(a, (list, tuple)):
+        if not isinstance(b, (list, tuple)) or len(a) != len(b):
+            return([path])
+        return([diff for i in range(len(a)) for diff in differences(a[i], b[i], f'{path}[{i}]')])
+    if type(a) is not type(b) or not (a == b or (a != a and b != b)):
+        return([path])
+    return([])
+
+
+def saved_attrs(plan):
+    """Saved attributes of the plan and its objects, keyed like the saved file."""
+    out = {key: value for key, value in plan.__dict__.items() if key[0] != '_' and key not in OBJECT_LISTS}
+    for lst in OBJECT_LISTS:
+        out[lst] = [dict(obj.serial_attrs()) for obj in getattr(plan, lst)]
+    return(out)
+
+
+def check_round_trip(plan, from_json, from_bundle):
+    """Paths where the bundle doesn't load like JSON (or, for DataFrames, as saved)."""
+    json_attrs = saved_attrs(from_json)
+    bundle_attrs = saved_attrs(from_bundle)
+    bad = []
+    for key in json_attrs:
+        if key in ['tax_df', 'analytical_timeseries', 'tax_df_dict']:
+            continue
+        bad += differences(json_attrs[key], bundle_attrs[key], '/'+key)
+    # DataFrames the JSON format loses are compared with the plan as saved
+    for key in ['tax_df', 'analytical_timeseries', 'tax_df_dict']:
+        bad += differences(getattr(plan, key), bundle_attrs[key], '/'+key)
+    return(bad)
+
+
+def best_time(function, repeats):
+    """Best seconds over repeats calls of function, and its last result."""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter()-start)
+    return(min(timings), result)
+
+
+if __name__ == '__main__':
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    failed = False
+    with tempfile.TemporaryDirectory() as folder:
+        for name, plan in sample_plans():
+            print(f'{name}: {len(plan.cal_year)} years, {sum([len(getattr(plan, lst)) for lst in OBJECT_LISTS])} objects')
+            loaded = {}
+            for extension in ['json', 'npz']:
+                path = os.path.join(folder, f'plan.{extension}')
+                save, _ = best_time(lambda: plan.save(path), repeats)
+                load, loaded[extension] = best_time(lambda: objs.plan.Plan.load(path), repeats)
+                print(f'  {extension:4}  {os.path.getsize(path)/1e3:8.1f} kB  save {save*1e3:7.1f} ms  load {load*1e3:7.1f} ms')
+            bad = check_round_trip(plan, loaded['json'], loaded['npz'])
+            print(f'  round trip: {"ok" if len(bad) == 0 else "differs at " + ", ".join(bad[:5])}')
+            failed = failed or len(bad) > 0
+    if failed:
+        sys.exit(1)
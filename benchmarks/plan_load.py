@@ -0,0 +1,78 @@
+"""
+Plan loading: per-phase load times for a large saved plan (Plan.load with timings).
+
+Builds the tax benchmark plan with extra expenses (40 years, about 200 objects, balanced),
+saves it as JSON and as a binary bundle, and prints the best load time of each format with
+its phases ('read', 'parse', 'objects', 'plan', 'index', 'verify'; see json_to_plan). Also
+checks that both formats load the same plan (as benchmarks/plan_formats.py does) and that
+re-saving the plan loaded from JSON writes the same file. Exits with status 1 if a check
+fails or the best JSON load is over budget. Run from the repository root:
+
+    python benchmarks/plan_load.py [repeats] [budget_seconds]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+from tax_per_filer import build_plan
+from plan_formats import check_round_trip
+
+import objs.plan
+import objs.financial_objects as fo
+
+# Seconds to load the large plan from JSON (best of the repeats)
+LOAD_BUDGET = 0.25
+
+
+def large_plan(n_expenses=160):
+    """The tax benchmark plan with n_expenses extra expenses, balanced."""
+    plan = build_plan()
+    for i in range(n_expenses):
+        expense = fo.ExpenseObj(plan.people[i % 2].id, 'Discretionary', 'Other', f'Expense {i}', '', plan.cal_year, 500 + 5*i, False, True, {'infl_rate': plan.col_rate})
+        plan.expenses.append(expense)
+        plan = expense.project(plan)
+    return(plan.balance_and_tax())
+
+
+def best_load(path, repeats):
+    """Best seconds over repeats loads of path, that load's phase timings and the plan."""
+    best = None
+    for _ in range(repeats):
+        timings = {}
+        start = time.perf_counter()
+        plan = objs.plan.Plan.load(path, timings=timings)
+        elapsed = time.perf_counter()-start
+        if best is None or elapsed < best[0]:
+            best = (elapsed, timings, plan)
+    return(best)
+
+
+if __name__ == '__main__':
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    budget = float(sys.argv[2]) if len(sys.argv) > 2 else LOAD_BUDGET
+    plan = large_plan()
+    n_objects = sum([len(getattr(plan, lst)) for lst in ['people', 'income', 'expenses', 'assets', 'liabilities']])
+    print(f'{len(plan.cal_year)} years, {n_objects} objects')
+    loaded = {}
+    failed = False
+    with tempfile.TemporaryDirectory() as folder:
+        for extension in ['json', 'npz']:
+            path = os.path.join(folder, f'plan.{extension}')
+            plan.save(path)
+            elapsed, timings, loaded[extension] = best_load(path, repeats)
+            phases = '  '.join([f'{phase} {seconds*1e3:.1f}' for phase, seconds in timings.items()])
+            print(f'  {extension:4}  load {elapsed*1e3:7.1f} ms  ({phases} ms)')
+            if extension == 'json':
+                failed = failed or elapsed > budget
+                with open(path) as saved:
+                    same = loaded['json'].to_json_string() == saved.read()
+                print(f'  re-save: {"same file" if same else "differs"}')
+                failed = failed or not same
+    bad = check_round_trip(plan, loaded['json'], loaded['npz'])
+    print(f'  round trip: {"ok" if len(bad) == 0 else "differs at " + ", ".join(bad[:5])}')
+    failed = failed or len(bad) > 0
+    print(f'budget {budget*1e3:.0f} ms for JSON')
+    if failed:
+        sys.exit(1)
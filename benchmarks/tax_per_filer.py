@@ -0,0 +1,151 @@
+"""
+Micro-benchmark: cost of calculate_filer_tax per filer and filing status, before and after
+its array helpers.
+
+Builds a two-earner plan with a child, daycare costs, 401k contributions and a
+mortgage, then times each filer's tax calculation twice: with the array helpers
+(choose_deduction, clamp_at_zero, child_tax_credit, dependent_care_terms) and with the
+row-wise code they replaced, kept here as a reference. Prints both times and the speedup
+per filer, and exits with status 1 if the two paths give different tax_df columns
+(values, dtypes or order). Run from the repository root:
+
+    python benchmarks/tax_per_filer.py [repeats]
+"""
+
+import contextlib
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import pandas as pd
+
+import objs.plan
+import objs.financial_objects as fo
+import utils.generators
+import utils.tax_functions
+
+
+def build_plan():
+    """Two earners, a child with daycare, 401k contributions and a home with a mortgage."""
+    plan = objs.plan.Plan('Benchmark', 2025, 40, 0.03, 0.02)
+    for name, birth_year, salary in [('Earner 1', 1990, 95000), ('Earner 2', 1988, 120000)]:
+        person = objs.plan.Person(name, birth_year, plan.cal_year, False)
+        plan.people.append(person)
+        plan.drawdown_order[person.id] = []
+        income = fo.IncomeObj(person.id, 'Earned', 'Salary', 'Salary', plan.cal_year, salary, False, True, True, {'infl_rate': plan.col_rate})
+        plan.income.append(income)
+        plan = income.project(plan)
+        savings = fo.AssetObj(person.id, 'Savings', 'Savings', 'Savings', '', plan.cal_year, 20000, 0.01, 0, True, True, {})
+        plan.assets.append(savings)
+        plan = savings.project(plan)
+        plan.drawdown_order[person.id] += [savings.id]
+        retirement = fo.AssetObj(person.id, 'Investment', 'Retirement', '401k', 'Traditional', plan.cal_year, 50000, 0.05, 0, False, True, {})
+        plan.assets.append(retirement)
+        plan = retirement.make_401k_objs(plan, income.id, (0.06, None), (0.04, 9000))
+        plan = retirement.project(plan)
+    earner = plan.people[0].id
+    daycare = fo.ExpenseObj(earner, 'Necessary', 'Childcare', 'Daycare', 'Child or Dependent Care', plan.cal_year, 9000, False, True, {'infl_rate': plan.col_rate})
+    plan.expenses.append(daycare)
+    plan = daycare.project(plan)
+    home_params = {'maintenance_rate': 0.01, 'maintenance_cap': 0.0, 'insurance': 1500, 'utilities': 3000, 'property_tax_rate': 0.011}
+    liab_dict = {'interest_rate': 0.065, 'attributes': {'term': 30, 'term_in_years': True, 'down_pct': True, 'down_payment': 0.2, 'pmi_rate': 0.01, 'pmi_thresh_pct': 0.2}}
+    asset_dict = {'growth_rate': 0.03, 'expenses_replaced': [], 'assets_replaced': []}
+    plan = utils.generators.buy_home(plan, earner, 2030, 600000, asset_dict, liab_dict, [(plan.drawdown_order[earner][0], 1.0)], home_params)
+    child_costs = pd.read_csv('data/USDA_2015_Child_Costs.csv')
+    plan = utils.generators.create_child(plan, 'Child', 2026, child_costs[child_costs['Salary'] == 107400])
+    return(plan)
+
+
+# Row-wise reference: the code calculate_filer_tax ran before its array helpers, with the
+# helpers' signatures
+
+def rowwise_clamp_at_zero(series):
+    return(series.apply(lambda x: max(x,0)))
+
+
+def rowwise_choose_deduction(standard, itemized):
+    standard = pd.concat([standard,pd.Series(['Standard' for _ in standard.index],index=standard.index)],axis=1).rename(columns={0:'amt',1:'name'})
+    itemized = pd.concat([itemized,pd.Series(['Itemized' for _ in itemized.index],index=itemized.index)],axis=1).rename(columns={0:'amt',1:'name'})
+    all_deductions = pd.concat([standard,itemized]).reset_index(drop=False)
+    return(all_deductions.groupby("index").agg({'amt':['idxmax','max']}).droplevel(0,axis=1).merge(all_deductions[['index','name']],left_on='idxmax',right_index=True).drop(['idxmax','index'],axis=1).rename(columns={'max':'amt'}))
+
+
+def rowwise_child_tax_credit(income, credit_max, limit, phaseout_rate):
+    child_credit = pd.DataFrame({'I':income,'M':credit_max,'L':limit,'R':phaseout_rate})
+    return(child_credit.apply(lambda x : x.M if x.I <= x.L else x.M - x.R*(x.I-x.L) if x.L < x.I <= x.L + (1/x.R)*x.M else 0,axis=1))
+
+
+def rowwise_dependent_care_terms(tax_tables, level, tax_filing, adjusted_gross_income, qualifying_dependents, cal_year):
+    credits = (tax_tables.fed if level == 'fed' else tax_tables.state)['credits']
+    eff_multi = pd.Series([credits['child_dep_care_multipliers'][tax_filing][i][list(lim >= adjusted_gross_income[i] for lim in credits['child_dep_care_limits'][tax_filing][i]).index(True)] for i in cal_year],index=cal_year)
+    eff_max = pd.Series([credits['child_dep_care_max'][tax_filing][i][0] if qualifying_dependents[i] == 1 else 0 if qualifying_dependents[i] == 0 else credits['child_dep_care_max'][tax_filing][i][1] for i in cal_year],index=cal_year)
+    return([eff_multi,eff_max])
+
+
+ROWWISE_HELPERS = {'clamp_at_zero': rowwise_clamp_at_zero,
+                   'choose_deduction': rowwise_choose_deduction,
+                   'child_tax_credit': rowwise_child_tax_credit,
+                   'dependent_care_terms': rowwise_dependent_care_terms}
+
+
+@contextlib.contextmanager
+def rowwise_helpers():
+    """Run calculate_filer_tax with the row-wise reference code in place of its array helpers."""
+    saved = {name: getattr(utils.tax_functions, name) for name in ROWWISE_HELPERS}
+    for name, helper in ROWWISE_HELPERS.items():
+        setattr(utils.tax_functions, name, helper)
+    try:
+        yield
+    finally:
+        for name, helper in saved.items():
+            setattr(utils.tax_functions, name, helper)
+
+
+def time_filers(plan, repeats):
+    """Mean seconds per calculate_filer_tax call and the tax_df it returns, by (filing status, filer)."""
+    people = [person.id for person in plan.people if person.dependent == False]
+    tax_tables = utils.tax_functions.get_tax_tables(plan)
+    filer_sets = [('single', [name, 'Joint']) for name in people] + [('joint', people + ['Joint'])]
+    timings = {}
+    tax_dfs = {}
+    for tax_filing, filers in filer_sets:
+        key = (tax_filing, 'Joint' if tax_filing == 'joint' else filers[0])
+        tax_dfs[key] = utils.tax_functions.calculate_filer_tax(plan, tax_filing, filers, tax_tables, [])[1]
+        start = time.perf_counter()
+        for _ in range(repeats):
+            utils.tax_functions.calculate_filer_tax(plan, tax_filing, filers, tax_tables, [])
+        timings[key] = (time.perf_counter() - start)/repeats
+    return(timings, tax_dfs)
+
+
+def same_tax_df(expected, actual):
+    """Whether two tax_df frames have the same columns, in order, with the same values and dtypes."""
+    try:
+        pd.testing.assert_frame_equal(expected, actual, check_exact=True)
+    except AssertionError:
+        return(False)
+    return(True)
+
+
+if __name__ == '__main__':
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    plan = build_plan()
+    with rowwise_helpers():
+        before, before_dfs = time_filers(plan, repeats)
+    after, after_dfs = time_filers(plan, repeats)
+    failed = False
+    print(f'{"":>8} {"filer":>10}  {"row-wise":>9}  {"array":>9}  speedup')
+    for key, seconds in after.items():
+        same = same_tax_df(before_dfs[key], after_dfs[key])
+        failed = failed or not same
+        tax_filing, filer = key
+        print(f'{tax_filing:>8} {filer:>10}  {before[key]*1000:6.2f} ms  {seconds*1000:6.2f} ms  {before[key]/seconds:5.1f}x  tax_df {"same" if same else "differs"}')
+    mean_before = sum(before.values())/len(before)
+    mean_after = sum(after.values())/len(after)
+    print(f'{"mean":>8} {"":>10}  {mean_before*1000:6.2f} ms  {mean_after*1000:6.2f} ms  {mean_before/mean_after:5.1f}x  (per filer)')
+    if failed:
+        sys.exit(1)
@@ -0,0 +1,63 @@
+#######################
+# DEFERRED ATTRIBUTES #
+#######################
+
+# Plans loaded lazily (json_to_plan or Plan.load with lazy=True) keep their heavy saved
+# attributes (tax frames, analytical time series, amortization tables, child cost frames)
+# as Deferred values until first used. Classes declare those attributes as DeferredAttr:
+# reading one loads a Deferred value and stores the result in its place, so the attribute
+# keeps its position in the object's __dict__. Code reading __dict__ directly sees the
+# Deferred value and can load it with resolve.
+
+class Deferred:
+    """A saved value and the function that loads it, called on first use only."""
+
+    def __init__(self,saved,loader):
+        self.saved = saved
+        self.loader = loader
+
+    def load(self):
+        """The loaded value (loading it the first time)."""
+        if self.loader is not None:
+            self.value = self.loader(self.saved)
+            self.saved = None
+            self.loader = None
+        return(self.value)
+
+    def __repr__(self):
+        return('Deferred('+('loaded' if self.loader is None else type(self.saved).__name__)+')')
+
+class DeferredAttr:
+    """Class attribute declaring an instance attribute that may hold a Deferred value."""
+
+    def __set_name__(self,owner,name):
+        self.name = name
+
+    def __get__(self,obj,objtype=None):
+        if obj is None:
+            return(self)
+        try:
+            value = obj.__dict__[self.name]
+        except KeyError:
+            raise AttributeError(f"'{type(obj).__name__}' object has no attribute '{self.name}'") from None
+        if isinstance(value,Deferred):
+            value = value.load()
+            obj.__dict__[self.name] = value
+        return(value)
+
+    def __set__(self,obj,value):
+        obj.__dict__[self.name] = value
+
+    def __delete__(self,obj):
+        try:
+            del obj.__dict__[self.name]
+        except KeyError:
+            raise AttributeError(self.name) from None
+
+def resolve(value):
+    """value, loaded if it's Deferred."""
+    return(value.load() if isinstance(value,Deferred) else value)
+
+def is_deferred(cls,name):
+    """Whether cls declares name as a DeferredAttr."""
+    return(isinstance(getattr(cls,name,None),DeferredAttr))
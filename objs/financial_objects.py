@@ -7,12 +7,14 @@ import pandas as pd
 import numpy as np
 import json as json
 import copy
+import collections
 
 # import sys
 # sys.path.append('../utils')
 
 #from utilities import expand_contract,term_months_from_payment,pmt,ppmt,ipmt
 import utils.utilities
+import objs.deferred
 
 
 # Class hierarchy
@@ -31,8 +33,24 @@ import utils.utilities
 #   |
 
 
+# Renames
+# | Counts renames of existing objects and people (new objects naming themselves don't
+# | count), so name indexes (objs.plan.ObjectRegistry) know when to re-index
+
+renames = 0
+
+def track_rename(obj,value):
+    """Count obj being renamed to value (call before assigning obj.name)."""
+    global renames
+    if 'name' in obj.__dict__ and obj.__dict__['name'] != value:
+        renames += 1
+
+
 class FinObj:
     """Base class for all financial objects (Income, Expenses, Assets, Liabilities)."""
+    # Attributes recomputed by projection, left out of inputs-only saves (components keep
+    # their keys, which say whose share each component is, but not their values)
+    derived_attrs = []
     
     def __init__(self,obj_type,person,cat,subcat,name,cal_year,value,editable,attributes={}):
         
@@ -75,36 +93,112 @@ class FinObj:
         # Set other attributes
         for key, value in attributes.items():
             setattr(self, key, value)
+
+    # Change tracking: every public attribute carries a version, bumped on assignment
+    # (or by mark_dirty for in-place edits), so a plan can tell which objects changed
+    # since they were last projected
+    
+    def __setattr__(self,name,value):
+        if name == 'name':
+            track_rename(self,value)
+        object.__setattr__(self,name,value)
+        if name[0] != '_':
+            self.mark_dirty(name)
+    
+    def mark_dirty(self,attr):
+        """Bump the version of attr (call after editing a Series or dict attribute in place)."""
+        versions = self.__dict__.setdefault('_versions',{})
+        versions[attr] = versions.get(attr,0) + 1
+        return(self)
+    
+    def mark_clean(self):
+        """Record the current attribute versions as projected."""
+        self._projected_versions = dict(self.__dict__.get('_versions',{}))
+        return(self)
+    
+    @property
+    def dirty_attrs(self):
+        """Attributes changed since the object was last projected."""
+        projected = self.__dict__.get('_projected_versions',{})
+        return([attr for attr, version in self.__dict__.get('_versions',{}).items() if projected.get(attr,0) != version])
         
     def to_dataframe(self):
         """Convert object to pandas DataFrame."""
         return(pd.DataFrame({x:self.__dict__[x] for x in self.__dict__ if x[0] != '_' and x != 'cal_year'},index=self.cal_year))
     
+    def serial_attrs(self,inputs_only=False):
+        """
+        (name, value) of the attributes saved with the plan, without copying them; with
+        inputs_only, without the derived attributes and component values.
+        """
+        if not inputs_only:
+            return([(key, value) for key, value in self.__dict__.items() if key[0] != '_'])
+        return([(key, ({person:None for person in value} if key == 'components' and isinstance(value,dict) else value))
+                for key, value in self.__dict__.items() if key[0] != '_' and key not in self.derived_attrs])
+    
     def to_serializable(self):
         """Convert object to JSON-serializable format."""
-        out = copy.deepcopy({key:(value.to_dict() if isinstance(value,(pd.Series,pd.DataFrame)) else value) for key, value in self.__dict__.items()})
+        attrs = {key:objs.deferred.resolve(value) for key, value in self.serial_attrs()}
+        out = copy.deepcopy({key:(value.to_dict() if isinstance(value,(pd.Series,pd.DataFrame)) else value) for key, value in attrs.items()})
         return(out)
+    
+    def remapped_paired_attr(self,replace_dict):
+        """paired_attr with parent ids remapped."""
+        return({key_: {replace_dict.get(key, key): val for key, val in self.paired_attr[key_].items()}
+                for key_ in ['series', 'time', 'share']})
         
+    def get_unaligned_attrs(self,cal_year):
+        """
+        Attributes that may not be aligned to cal_year: those assigned (or marked dirty)
+        since the object was last standardized to the same calendar, or all of them.
+        """
+        aligned_cal_year = self.__dict__.get('_aligned_cal_year')
+        if aligned_cal_year is cal_year or (isinstance(aligned_cal_year,pd.Series) and aligned_cal_year.equals(cal_year)):
+            aligned_versions = self._aligned_versions
+            return([attr for attr, version in self.__dict__.get('_versions',{}).items() if aligned_versions.get(attr) != version and attr in self.__dict__])
+        return([x for x in self.__dict__.keys() if x[0] != '_'])
+    
     def standardize_timeseries(self,cal_year):
         """Standardize time series to match plan calendar years."""
-        self.cal_year = cal_year
-        all_series = [x for x in self.__dict__.keys() if x[0] != '_' and isinstance(self.__dict__[x],pd.Series) and x != 'cal_year']
-        all_dicts = [x for x in self.__dict__.keys() if x[0] != '_' and isinstance(self.__dict__[x],dict)]
+        attrs = self.get_unaligned_attrs(cal_year)
+        # Re-pointing at an equal calendar is not a change to the object
+        if isinstance(self.cal_year,pd.Series) and self.cal_year.equals(cal_year):
+            self.__dict__['cal_year'] = cal_year
+        else:
+            self.cal_year = cal_year
+        all_series = [x for x in attrs if isinstance(self.__dict__[x],pd.Series) and x != 'cal_year']
+        all_dicts = [x for x in attrs if isinstance(self.__dict__[x],dict)]
         for series in all_series:
             self.__dict__[series] = utils.utilities.expand_contract(self.__dict__[series],cal_year,val_pad_front=True,val_pad_back=True)
         for dict_ in all_dicts:
             for key in self.__dict__[dict_].keys():
                 if isinstance(self.__dict__[dict_][key],pd.Series):
                     self.__dict__[dict_][key] = utils.utilities.expand_contract(self.__dict__[dict_][key],cal_year,val_pad_front=True,val_pad_back=True)
+        self._aligned_cal_year = cal_year
+        self._aligned_versions = dict(self.__dict__.get('_versions',{}))
         return(self)
 
-    def project(self,plan,init_id=None):
+    def project(self,plan):
         """
         Main projection method that updates object values and resolves dependencies.
         
+        Projects this object, then every object that depends on it, each once and in
+        topological order (see Plan.project_objects).
+        
+        Args:
+            plan: The plan object containing all financial objects
+            
+        Returns:
+            Updated plan object
+        """
+        return(plan.project_objects([self]))
+
+    def project_self(self,plan):
+        """
+        Update this object's values from its paired parents, without projecting its children.
+        
         Args:
             plan: The plan object containing all financial objects
-            init_id: ID of initial object to prevent infinite loops
             
         Returns:
             Updated plan object
@@ -141,15 +235,12 @@ class FinObj:
                     if cap is not None:
                         infl_rate = utils.utilities.expand_contract(plan.infl_rate, self.cal_year)
                         cap_start_year = int(self.start_year)
-                        cumulative_infl = [
-                            1 if yr == cap_start_year else pd.Series(1+infl_rate.loc[cap_start_year:yr-1]).product()
-                            for yr in self.cal_year
-                        ]
+                        cumulative_infl = utils.utilities.cumulative_inflation(infl_rate,self.cal_year,cap_start_year)
                         if isinstance(cap, pd.Series):
                             cap_series = utils.utilities.expand_contract(cap, self.cal_year)
                         else:
                             cap_series = pd.Series(cap, index=self.cal_year)
-                        cap_series = cap_series * pd.Series(cumulative_infl,index=self.cal_year)
+                        cap_series = cap_series * cumulative_infl.values
                         cap_series_list.append(cap_series)
                 props = pd.concat(props_list, axis=1).min(axis=1)
                 series_val = props * getattr(plan.get_object_from_id(parent),self.paired_attr['series'][parent][0][0])
@@ -171,15 +262,12 @@ class FinObj:
                     if cap is not None:
                         infl_rate = utils.utilities.expand_contract(plan.infl_rate, self.cal_year)
                         cap_start_year = int(self.start_year)
-                        cumulative_infl = [
-                            1 if yr == cap_start_year else pd.Series(1+infl_rate.loc[cap_start_year:yr-1]).product()
-                            for yr in self.cal_year
-                        ]
+                        cumulative_infl = utils.utilities.cumulative_inflation(infl_rate,self.cal_year,cap_start_year)
                         if isinstance(cap, pd.Series):
                             cap_series = utils.utilities.expand_contract(cap, self.cal_year)
                         else:
                             cap_series = pd.Series(cap, index=self.cal_year)
-                        cap_series = cap_series * pd.Series(cumulative_infl,index=self.cal_year)
+                        cap_series = cap_series * cumulative_infl.values
                         series_val = series_val.combine(cap_series, min)
 
                     if pair[1] not in temp_series:
@@ -241,41 +329,7 @@ class FinObj:
             else:
                 self.components = {self.person:self.value.astype(int)}
         
-        # Update all dependent objects, passing the object_id of the first object to
-        # be projected. If the projection encounters a loop in the dependence network,
-        # It will break out after projecting the initial object a second time.
-        if init_id == self.id:
-            return(plan)
-        else:
-            if init_id == None:
-                init_id = self.id
-                
-             # Project all child objects dependent on current object, and pass init_id 
-             # to prevent a loop
-            if self.dependent_objs == True:
-                child_ids = []
-                for lst in plan.pairs.values():
-                    if not isinstance(lst, (list, tuple)):
-                        continue
-                    for pair in lst:
-                        if isinstance(pair, (list, tuple)) and len(pair) > 1:
-                            parent_id, child_id = pair[0], pair[1]
-                        elif isinstance(pair, dict):
-                            if 'value' in pair and isinstance(pair['value'], (list, tuple)) and len(pair['value']) > 1:
-                                parent_id, child_id = pair['value'][0], pair['value'][1]
-                            else:
-                                parent_id = pair.get('parent') or pair.get('source')
-                                child_id = pair.get('child') or pair.get('target')
-                        else:
-                            continue
-                        if parent_id == self.id:
-                            child_ids.append(child_id)
-                for child_id in child_ids:
-                    child_obj = plan.get_object_from_id(child_id)
-                    if child_obj is None:
-                        continue
-                    plan = child_obj.project(plan,init_id)
-        
+        self = self.mark_clean()
         return(plan)
     
     
@@ -306,11 +360,8 @@ class IncExpObj(FinObj):
             self.value_input = utils.utilities.expand_contract(self.value_input,self.cal_year)
             self.infl_rate = utils.utilities.expand_contract(self.infl_rate,self.cal_year.loc[start_idx:])
             base_year = int(self.start_year) if int(self.start_year) in self.cal_year.values else int(self.cal_year.iloc[0])
-            cumulative_infl = [
-                1 if yr == base_year else pd.Series(1+self.infl_rate.loc[base_year:yr-1]).product()
-                for yr in self.cal_year
-            ]
-            self.value = (self.value_input * pd.Series(cumulative_infl,index=self.cal_year)).astype(int)
+            cumulative_infl = utils.utilities.cumulative_inflation(self.infl_rate,self.cal_year,base_year)
+            self.value = (self.value_input * pd.Series(cumulative_infl.values,index=self.cal_year)).astype(int)
         self.value = utils.utilities.expand_contract(self.value.loc[self.start_year:self.end_year],self.cal_year,val_pad_front=True,val_pad_back=True).astype(int)
         return(self)
     
@@ -326,11 +377,8 @@ class IncExpObj(FinObj):
             start_idx = start_idx[0]
             self.infl_rate = utils.utilities.expand_contract(self.infl_rate,self.cal_year.loc[start_idx:])
             base_year = int(self.start_year) if int(self.start_year) in self.cal_year.values else int(self.cal_year.iloc[0])
-            cumulative_infl = [
-                1 if yr == base_year else pd.Series(1+self.infl_rate.loc[base_year:yr-1]).product()
-                for yr in self.cal_year
-            ]
-            self.value = (self.value / pd.Series(cumulative_infl,index=self.cal_year)).astype(int)
+            cumulative_infl = utils.utilities.cumulative_inflation(self.infl_rate,self.cal_year,base_year)
+            self.value = (self.value / pd.Series(cumulative_infl.values,index=self.cal_year)).astype(int)
         return(self)
     
 
@@ -453,19 +501,16 @@ class IncomeObj(IncExpObj):
         
         # Find all child objects that depend on this income for pension
         child_ids = []
-        for pair_list in plan.pairs.values():
-            for pair in pair_list:
-                if pair[0] == self.id:
-                    child_obj = plan.get_object_from_id(pair[1])
-                    if child_obj is not None:
-                        # Check if this child is pension-related
-                        if (child_obj.obj_type == 'Expense' and 
-                            child_obj.name.startswith('Pension Contribution')):
-                            child_ids.append(pair[1])
-                        elif (child_obj.obj_type == 'Asset' and 
-                              child_obj.name == 'Pension Equivalent'):
-                            child_ids.append(pair[1])
-        child_ids = list(set(child_ids))
+        for child_id in set(plan.graph.get_children(self.id)):
+            child_obj = plan.get_object_from_id(child_id)
+            if child_obj is not None:
+                # Check if this child is pension-related
+                if (child_obj.obj_type == 'Expense' and 
+                    child_obj.name.startswith('Pension Contribution')):
+                    child_ids.append(child_id)
+                elif (child_obj.obj_type == 'Asset' and 
+                      child_obj.name == 'Pension Equivalent'):
+                    child_ids.append(child_id)
         
         # Remove all pension-related child objects
         for child_id in child_ids:
@@ -491,30 +536,16 @@ class IncomeObj(IncExpObj):
             return None
         
         # Find the pension contribution expense
-        for pair_list in plan.pairs.values():
-            if not isinstance(pair_list, (list, tuple)):
-                continue
-            for pair in pair_list:
-                if isinstance(pair, (list, tuple)) and len(pair) > 1:
-                    parent_id, child_id = pair[0], pair[1]
-                elif isinstance(pair, dict):
-                    if 'value' in pair and isinstance(pair['value'], (list, tuple)) and len(pair['value']) > 1:
-                        parent_id, child_id = pair['value'][0], pair['value'][1]
-                    else:
-                        parent_id = pair.get('parent') or pair.get('source')
-                        child_id = pair.get('child') or pair.get('target')
-                else:
-                    continue
-                if parent_id == self.id:
-                    child_obj = plan.get_object_from_id(child_id)
-                    if (child_obj is not None and 
-                        child_obj.obj_type == 'Expense' and 
-                        child_obj.name.startswith('Pension Contribution')):
-                        # Get the contribution rate from the paired attributes
-                        if self.id in child_obj.paired_attr['series']:
-                            for attr_pair in child_obj.paired_attr['series'][self.id]:
-                                if attr_pair[0] == 'value' and attr_pair[1] == 'value':
-                                    return attr_pair[2]
+        for child_id in plan.graph.get_children(self.id):
+            child_obj = plan.get_object_from_id(child_id)
+            if (child_obj is not None and 
+                child_obj.obj_type == 'Expense' and 
+                child_obj.name.startswith('Pension Contribution')):
+                # Get the contribution rate from the paired attributes
+                if self.id in child_obj.paired_attr['series']:
+                    for attr_pair in child_obj.paired_attr['series'][self.id]:
+                        if attr_pair[0] == 'value' and attr_pair[1] == 'value':
+                            return attr_pair[2]
         return None
 
     def add_payroll_tax(self, tax_name, tax_rate):
@@ -578,7 +609,7 @@ class ExpenseObj(IncExpObj):
                     self.components[person_id] = (self.value*self.share_props).astype(int)
                 else:
                     self.components[person_id] = (self.value*(1-self.share_props)).astype(int)
-
+            self = self.mark_dirty('components')
             return(self)
         
     def update(self):
@@ -591,6 +622,7 @@ class ExpenseObj(IncExpObj):
             self = self.adjust_share()
         else:
             self.components[self.person] = self.value.astype(int)
+            self = self.mark_dirty('components')
         return(self)
 
     
@@ -599,6 +631,7 @@ class ExpenseObj(IncExpObj):
 class AssetObj(FinObj):
     """Represents assets (retirement accounts, savings, real estate, etc.)."""
     counter = 0
+    derived_attrs = ['gains']
     
     def __init__(self,person,cat,subcat,name,tax_keyword,cal_year,value,growth_rate,contribution,interest,editable,attributes={}):
         super().__init__('Asset',person,cat,subcat,name,cal_year,value,editable,attributes)
@@ -620,6 +653,22 @@ class AssetObj(FinObj):
         # Track if there is a sell action taken with this asset (at self.end_year)
         self.sold = 0; #0 = never sold, 1 is sold at some point, -1 has had sale reversed, and need to resell.
     
+    def compound_value(self):
+        """
+        Compound the start-year value forward over the aligned growth and flow series.
+
+        Runs the same recurrence, in the same operation order, as the per-year
+        label lookups it replaces, so balances are bit-identical; the series are
+        read once as arrays.
+        """
+        growth = self.growth_rate.tolist()
+        flows = zip(self.contribution.tolist(),self.secondary_contribution.tolist(),self.transaction.tolist())
+        next(flows)
+        temp_val = self.value.iloc[:1].tolist()
+        for rate, (contribution, secondary, transaction) in zip(growth[1:],flows):
+            temp_val.append(temp_val[-1]*(1+rate)+contribution+secondary+transaction)
+        return(temp_val)
+
     def update(self):
         """Update asset values using compound growth formula."""
         start_idx = self.cal_year[self.cal_year==self.start_year].index
@@ -631,13 +680,17 @@ class AssetObj(FinObj):
         
         # Go into the loop if the value is not in the paired attributes
         if 'value' not in [item[1] for sublist in self.paired_attr['series'].values() for item in sublist]:
-            temp_val = []
-            for yr in self.cal_year.loc[start_idx:]:
-                if yr == self.start_year:
-                    temp_val.append(self.value[yr])
-                else:
-                    temp_val.append(temp_val[-1]*(1+self.growth_rate[yr])+self.contribution[yr]+self.secondary_contribution[yr]+self.transaction[yr])
-            self.value = pd.Series(temp_val,index=self.cal_year.loc[start_idx:]).astype(int)
+            years = self.cal_year.loc[start_idx:]
+            if len(years) > 0 and years.iloc[0] == self.start_year:
+                self.value = pd.Series(self.compound_value(),index=years).astype(int)
+            else:
+                temp_val = []
+                for yr in years:
+                    if yr == self.start_year:
+                        temp_val.append(self.value[yr])
+                    else:
+                        temp_val.append(temp_val[-1]*(1+self.growth_rate[yr])+self.contribution[yr]+self.secondary_contribution[yr]+self.transaction[yr])
+                self.value = pd.Series(temp_val,index=years).astype(int)
         
         self = self.standardize_timeseries(self.cal_year)
         self.gains = self.value.diff(1).shift(-1)
@@ -726,7 +779,7 @@ class AssetObj(FinObj):
     def sell(self,plan,year,prune=False):
         """Sell asset and handle proceeds distribution."""
         # What to do if there is no drawdown (i.e. sell without a savings account...weird)
-        liab_ids = [pair[0] for pair in plan.pairs['series'] if pair[1]==self.id and pair[0].split('_')[0] == 'Liability']
+        liab_ids = [parent_id for parent_id in plan.graph.get_parents(self.id,'series') if parent_id.split('_')[0] == 'Liability']
 
         # If prune is true, then manually set the end_years of the asset (and liability)
         if prune == True:
@@ -766,7 +819,7 @@ class AssetObj(FinObj):
         """Reverse a previous asset sale."""
         # Undoes the operations of .sell() - sets end_year to max(cal_year) and 
         # Reverse the deposit (or put into drawdown[0])
-        liab_ids = [pair[0] for pair in plan.pairs['series'] if pair[1]==self.id and pair[0].split('_')[0] == 'Liability']
+        liab_ids = [parent_id for parent_id in plan.graph.get_parents(self.id,'series') if parent_id.split('_')[0] == 'Liability']
 
         # If prune is true, then manually set the end_years of the asset (and liability)
         if prune == True:
@@ -805,18 +858,69 @@ class AssetObj(FinObj):
     def deposit(self,amt,year):
         """Add money to asset."""
         self.transaction[year] += amt
+        self = self.mark_dirty('transaction')
         return(self)
 
     def withdrawal(self,amt,year):
         """Remove money from asset (for partial sales)."""
         self.deposit(-amt,year)
         return(self)
-    
+
+class CompoundRecurrence:
+    """
+    An asset's compound value recurrence (AssetObj.compound_value), stepped one year at a time.
+
+    Lets balancing and multi-year drawdowns read what the asset's value in a year would be for a
+    given amount in one of its flows (contribution, secondary_contribution or transaction) that
+    year without projecting it, using the same operations (and int truncation) as AssetObj.update.
+    Built from an aligned, projected asset; years before first_pos are replayed from its current flows.
+    """
+    flow_names = ['contribution','secondary_contribution','transaction']
+
+    def __init__(self,asset,first_pos,flow='contribution'):
+        years = asset.cal_year.tolist()
+        self.start = years.index(asset.start_year)
+        self.flow = flow
+        self.value = asset.value.tolist()
+        self.growth = asset.growth_rate.tolist()
+        self.flows = {name:getattr(asset,name).tolist() for name in self.flow_names}
+        # Unrounded values from the start year on
+        self.temp = {}
+        for pos in range(self.start,first_pos):
+            self.record(pos,self.flows[flow][pos])
+
+    def value_at(self,pos,amount):
+        """Unrounded value at position pos, given that year's amount in the flow."""
+        if pos <= self.start:
+            return(self.value[pos])
+        flows = {name:self.flows[name][pos] for name in self.flow_names}
+        flows[self.flow] = amount
+        return(self.temp[pos-1]*(1+self.growth[pos])+flows['contribution']+flows['secondary_contribution']+flows['transaction'])
+
+    def record(self,pos,amount):
+        """Fix the flow's amount at position pos, so later years compound from it."""
+        if pos >= self.start:
+            self.temp[pos] = self.value_at(pos,amount)
+
+    def matches(self,asset,first_pos):
+        """Whether the asset's projected values follow the recurrence from first_pos on."""
+        values = asset.value.tolist()
+        return(all([values[pos] == int(self.temp[pos]) for pos in range(max(first_pos,self.start),len(values))]))
+
 ###############################################################################
 
 class LiabObj(FinObj):
     """Represents liabilities (mortgages, loans, credit cards)."""
     counter = 0
+    derived_attrs = ['amortization_table','year_annual','extra_payment_annual','interest_payment_annual','payment_annual',
+                     'pmi_annual','principal_payment_annual','total_payment_annual']
+    # Loaded on first use after a lazy load (see objs.deferred)
+    amortization_table = objs.deferred.DeferredAttr()
+    # Annualized schedules shared by all liabilities, least recently used evicted first
+    schedule_cache = collections.OrderedDict()
+    schedule_cache_maxsize = 128
+    schedule_cache_hits = 0
+    schedule_cache_misses = 0
     
     def __init__(self,person,cat,subcat,name,tax_keyword,cal_year,interest_rate,value,existing,editable,attributes):
         super().__init__('Liability',person,cat,subcat,name,cal_year,value,editable,attributes)
@@ -862,39 +966,46 @@ class LiabObj(FinObj):
     def amortize(self):
         """Calculate amortization schedule for liability."""
         self.payment = utils.utilities.pmt(self.present_value,self.interest_rate,self.term)
-        year, mon, time_interp, period, ppay, ipay, pay = [[],[],[],[],[],[],[]]
-        value = [self.present_value]
         epay = list(self.extra_payment)
+        # The balance is rounded to the cent every month, so it is scanned rather than
+        # taken from the closed form; everything else is built as arrays
+        monthly_rate = self.interest_rate/12
+        ipay, ppay = [[],[]]
+        value = [self.present_value]
         for i in range(self.term):
             pv = value[-1]
-            p = min(self.payment,pv*(1+(self.interest_rate/12)))
-            ipay += [np.round(utils.utilities.ipmt(pv,self.interest_rate),2)]
-            ppay += [np.round(utils.utilities.ppmt(pv,self.interest_rate,p),2)]
-            pay += [ppay[-1]+ipay[-1]]
-            period += [i + 1]
-            mon += [i % 12 + 1]
-            year += [int(np.floor(i/12))+self.start_year]
-            time_interp += [int(np.floor(i/12))+self.start_year + i % 12]
+            p = min(self.payment,pv*(1+monthly_rate))
+            ipay.append(utils.utilities.round_cents(monthly_rate*pv))
+            ppay.append(utils.utilities.round_cents(p-monthly_rate*pv))
             if i < self.term-1:
-                value += [np.round(pv-ppay[-1]-epay[i],2)]
-        pmipay = [0 for i in range(self.term)]
+                value.append(utils.utilities.round_cents(pv-ppay[-1]-epay[i]))
+        period = np.arange(1,self.term+1)
+        mon = (period-1) % 12 + 1
+        year = (period-1)//12 + self.start_year
+        pay = np.array(ppay)+np.array(ipay)
+        pmipay = np.zeros(self.term,dtype=int)
         if self.subcategory == 'Mortgage':
             # Interpolate asset_value - should be an exponential interpolation, but whatever...it doesn't make a huge difference
-            asset_val_interp = list(np.interp(time_interp,self.cal_year,self.asset_value))
-            equity_prop = [1-value[i]/asset_val_interp[i] for i in range(self.term)]
+            asset_val_interp = np.interp(year+(period-1) % 12,self.cal_year,self.asset_value)
+            with np.errstate(divide='ignore',invalid='ignore'):
+                equity_prop = 1-np.array(value,dtype=float)/asset_val_interp
             #pmi_thresh = (1-self.pmi_thresh_pct)*self.principal
             pmi = self.pmi_rate*self.principal/12
-            pmipay = [pmi if equity_prop[i] > self.pmi_thresh_pct else 0 for i in range(self.term)]
-            pay = [pay[i]+pmipay[i] for i in range(self.term)]
-        tpay = [pay[i]+epay[i] for i in range(self.term)]
-        amortization_table = pd.DataFrame({'year':year,'month':mon,'period':period,
-                                           'value':value,'principal_payment':ppay,
-                                           'interest_payment':ipay,'pmi':pmipay,'payment':pay,'extra_payment':epay,'total_payment':tpay},index=period)
+            has_pmi = equity_prop > self.pmi_thresh_pct
+            if has_pmi.any():
+                pmipay = np.where(has_pmi,pmi,0.0)
+            pay = pay+pmipay
+        tpay = pay+np.array(epay[:self.term])
+        columns = {'year':year,'month':mon,'period':period,
+                   'value':np.array(value),'principal_payment':np.array(ppay),
+                   'interest_payment':np.array(ipay),'pmi':pmipay,'payment':pay,'extra_payment':np.array(epay),'total_payment':tpay}
+        # Zero everything from the first month of end_year (or the last month) on
+        payoff_ind = int(min(period[year==self.end_year],default=self.term))
+        for col in columns.values():
+            col[payoff_ind-1:] = 0
+        amortization_table = pd.DataFrame(columns,index=np.arange(1,self.term+1))
         
         self.amortization_table = amortization_table
-        payoff_ind = min(self.amortization_table.index[self.amortization_table['year']==self.end_year],
-                         default=max(self.amortization_table.index))
-        amortization_table.loc[payoff_ind:,:] = 0
         # if 'payoff_year' in self.__dict__:
         #     payoff_ind = min(self.amortization_table.index[self.amortization_table['year']==self.payoff_year])
         #     amortization_table.loc[payoff_ind:,:] = 0
@@ -902,21 +1013,62 @@ class LiabObj(FinObj):
         self.extra_payment = list(self.amortization_table['extra_payment'])
         return(self)
     
+    def schedule_key(self):
+        """Hash of every input the amortization schedule depends on."""
+        inputs = [self.subcategory,self.present_value,self.interest_rate,self.term,
+                  self.start_year,self.end_year,list(self.extra_payment)]
+        if self.subcategory == 'Mortgage':
+            inputs += [self.principal,self.pmi_rate,self.pmi_thresh_pct,self.cal_year,self.asset_value]
+        return(utils.utilities.fingerprint(*inputs))
+    
+    @classmethod
+    def schedule_cache_info(cls):
+        """Hits, misses and size of the shared schedule cache."""
+        return({'hits':cls.schedule_cache_hits,'misses':cls.schedule_cache_misses,
+                'size':len(cls.schedule_cache),'maxsize':cls.schedule_cache_maxsize})
+    
+    @classmethod
+    def clear_schedule_cache(cls):
+        """Empty the shared schedule cache and reset its counters."""
+        cls.schedule_cache.clear()
+        cls.schedule_cache_hits = 0
+        cls.schedule_cache_misses = 0
+    
     def annualize_amort(self):
-        """Convert monthly amortization to annual totals."""
-        self = self.amortize()
-        amort_annual = self.amortization_table.pivot_table(index=['year'],
-                                                           values=['value','payment','principal_payment','interest_payment','pmi','extra_payment','total_payment'],
-                                                           aggfunc={'payment':'sum','principal_payment':'sum','interest_payment':'sum','pmi':'sum','extra_payment':'sum','total_payment':'sum','value':'max'})
-        amort_annual = amort_annual.reset_index(drop=False)
-        amort_annual = amort_annual.to_dict('series')
-        amort_annual = pd.DataFrame({key:list(amort_annual[key]) for key in amort_annual})
-        amort_annual.index = amort_annual['year']
-        amort_annual = amort_annual.rename(columns={key:(key+'_annual') for key in amort_annual.columns if key != 'value'})
-
-        self.cal_year = pd.Series(amort_annual.index)
-        for col in amort_annual.columns:
-            setattr(self,col,amort_annual[col].astype(int))
+        """Convert monthly amortization to annual totals (cached by loan inputs)."""
+        key = self.schedule_key()
+        schedule = LiabObj.schedule_cache.get(key)
+        if schedule is None:
+            LiabObj.schedule_cache_misses += 1
+            self = self.amortize()
+            table = self.amortization_table
+            sum_cols = ['extra_payment','interest_payment','payment','pmi','principal_payment','total_payment']
+            years, sums = utils.utilities.group_sum(table['year'].to_numpy(),table[sum_cols].to_numpy(dtype=float))
+            _, values = utils.utilities.group_max(table['year'].to_numpy(),table['value'].to_numpy())
+            year_index = pd.Index(years,name='year')
+            
+            annual = {'cal_year':pd.Series(year_index),
+                      'year_annual':pd.Series(years,index=year_index,name='year_annual').astype(int)}
+            for j, col in enumerate(sum_cols):
+                annual[col+'_annual'] = pd.Series(sums[:,j],index=year_index,name=col+'_annual').astype(int)
+            annual['value'] = pd.Series(values,index=year_index,name='value').astype(int)
+            schedule = {'payment':self.payment,'amortization_table':table.copy(),
+                        'extra_payment':list(self.extra_payment),'annual':annual}
+            LiabObj.schedule_cache[key] = schedule
+            if len(LiabObj.schedule_cache) > LiabObj.schedule_cache_maxsize:
+                LiabObj.schedule_cache.popitem(last=False)
+        else:
+            LiabObj.schedule_cache_hits += 1
+            LiabObj.schedule_cache.move_to_end(key)
+            self.payment = schedule['payment']
+            self.amortization_table = schedule['amortization_table'].copy()
+            self.extra_payment = list(schedule['extra_payment'])
+        
+        # Deep copies in and out of the cache: without copy-on-write (pandas < 3), an in-place
+        # edit such as liab.interest_payment_annual[year] = ... would otherwise reach the cache
+        # and every loan sharing the schedule
+        for attr, series in schedule['annual'].items():
+            setattr(self,attr,series.copy())
 
         return(self)
     
@@ -928,11 +1080,10 @@ class LiabObj(FinObj):
         """Create related expense objects for liability payments."""
         self.dependent_objs = True
         #
-        paired = [x for x in plan.pairs['series'] if x[0]==self.id]
         subcat = self.subcategory
-        for pair in paired:
-            if pair[1].split('_')[0] == 'Asset':
-                subcat = plan.get_object_from_id(pair[1]).name
+        for child_id in plan.graph.get_children(self.id,'series'):
+            if child_id.split('_')[0] == 'Asset':
+                subcat = plan.get_object_from_id(child_id).name
                 
         exp_obj = ExpenseObj(self.person,'Necessary',subcat,self.name,'',self.cal_year,self.total_payment_annual,
                              True,False,{'start_year':self.start_year,'end_year':self.end_year})
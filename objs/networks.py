@@ -0,0 +1,184 @@
+###################
+# OBJECT NETWORKS #
+###################
+
+# Adjacency-list view of plan.pairs. plan.pairs stays the serialized source of
+# truth (a dict of [parent_id, child_id] lists per network); the graph mirrors it
+# as parent -> children and child -> parents lists so that child/parent discovery
+# is O(degree) instead of a scan over every pair in the plan.
+
+# | attr: children, parents (dict of network -> {obj_id: [obj_id,...]})
+# | methods: sync, rebuild, add_edge, remove_edge, remove_node, get_children, get_parents,
+# |          get_descendants, get_ancestors, get_projection_order
+
+import heapq
+
+import utils.utilities
+
+
+class DependencyGraph:
+    """Parent/child adjacency lists for the series, time and share networks."""
+    networks = ['series','time','share']
+
+    def __init__(self):
+        # Adjacency lists keep pair order and multiplicity, so iterating children
+        # visits them exactly as a scan over plan.pairs would
+        self.children = {network:{} for network in self.networks}
+        self.parents = {network:{} for network in self.networks}
+
+        # (pairs dict, {network:(list, length)}) last mirrored
+        self.synced_pairs = None
+        self.synced = {network:(None,0) for network in self.networks}
+
+    def add_edge(self,network,parent_id,child_id):
+        self.children[network].setdefault(parent_id,[]).append(child_id)
+        self.parents[network].setdefault(child_id,[]).append(parent_id)
+        return(self)
+
+    def remove_edge(self,network,parent_id,child_id):
+        if child_id in self.children[network].get(parent_id,[]):
+            self.children[network][parent_id].remove(child_id)
+            self.parents[network][child_id].remove(parent_id)
+        return(self)
+
+    def remove_node(self,obj_id):
+        """Remove every edge into or out of obj_id."""
+        for network in self.networks:
+            for child_id in self.children[network].pop(obj_id,[]):
+                if child_id != obj_id:
+                    self.parents[network][child_id] = [x for x in self.parents[network][child_id] if x != obj_id]
+            for parent_id in self.parents[network].pop(obj_id,[]):
+                if parent_id != obj_id:
+                    self.children[network][parent_id] = [x for x in self.children[network][parent_id] if x != obj_id]
+        return(self)
+
+    def rebuild_network(self,pairs,network):
+        self.children[network] = {}
+        self.parents[network] = {}
+        pair_list = pairs.get(network,[])
+        if isinstance(pair_list,(list,tuple)):
+            for pair in pair_list:
+                ids = utils.utilities.pair_to_ids(pair)
+                if ids is not None:
+                    self.add_edge(network,ids[0],ids[1])
+        self.synced[network] = (pair_list,len(pair_list) if isinstance(pair_list,(list,tuple)) else 0)
+        return(self)
+
+    def rebuild(self,pairs):
+        """Rebuild all adjacency lists from a plan.pairs dict."""
+        for network in self.networks:
+            self = self.rebuild_network(pairs,network)
+        self.synced_pairs = pairs
+        return(self)
+
+    def sync(self,pairs):
+        """
+        Bring the graph up to date with plan.pairs.
+
+        Pairs appended to a network list are added incrementally; a replaced dict
+        or list, or a list that shrank, is rebuilt.
+        """
+        if pairs is not self.synced_pairs:
+            return(self.rebuild(pairs))
+        for network in self.networks:
+            pair_list = pairs.get(network,[])
+            prev, n = self.synced[network]
+            if pair_list is prev and len(pair_list) == n:
+                continue
+            elif pair_list is prev and len(pair_list) > n:
+                for pair in pair_list[n:]:
+                    ids = utils.utilities.pair_to_ids(pair)
+                    if ids is not None:
+                        self.add_edge(network,ids[0],ids[1])
+                self.synced[network] = (pair_list,len(pair_list))
+            else:
+                self = self.rebuild_network(pairs,network)
+        return(self)
+
+    def mark_synced(self,pairs):
+        """Record pairs as mirrored after the graph has been edited to match them."""
+        self.synced_pairs = pairs
+        self.synced = {network:(pairs.get(network,[]),len(pairs.get(network,[]))) for network in self.networks}
+        return(self)
+
+    def get_children(self,obj_id,network=None):
+        """Child ids of obj_id in pair order (all networks, series/time/share, if network is None)."""
+        if network is not None:
+            return(list(self.children[network].get(obj_id,[])))
+        return([child_id for network in self.networks for child_id in self.children[network].get(obj_id,[])])
+
+    def get_parents(self,obj_id,network=None):
+        """Parent ids of obj_id in pair order (all networks if network is None)."""
+        if network is not None:
+            return(list(self.parents[network].get(obj_id,[])))
+        return([parent_id for network in self.networks for parent_id in self.parents[network].get(obj_id,[])])
+
+    def _traverse(self,obj_id,adjacency):
+        found = {network:set() for network in self.networks}
+        to_process = [obj_id]
+        processed = set()
+        while to_process:
+            current_id = to_process.pop()
+            if current_id in processed:
+                continue
+            processed.add(current_id)
+            for network in self.networks:
+                for next_id in adjacency[network].get(current_id,[]):
+                    found[network].add(next_id)
+                    if next_id not in processed:
+                        to_process.append(next_id)
+        return({network:list(found[network]) for network in self.networks})
+
+    def get_descendants(self,obj_id):
+        """All descendants of obj_id, reached through any network, grouped by the network of the final edge."""
+        return(self._traverse(obj_id,self.children))
+
+    def get_ancestors(self,obj_id):
+        """All ancestors of obj_id, reached through any network, grouped by the network of the final edge."""
+        return(self._traverse(obj_id,self.parents))
+
+    def get_projection_order(self,root_ids,follow):
+        """
+        Order root_ids and everything downstream of them so each object is projected once.
+
+        Args:
+            root_ids: Ids of the objects that changed, in the order they were given
+            follow: Callable, True if the children of an id should be projected after it
+                    (i.e. the object has dependent_objs)
+
+        Returns:
+            [order, cycle_ids] - order lists each affected id once, parents before
+            children, ties broken by depth-first discovery order (the order the old
+            recursive projection first reached them). cycle_ids lists ids on or behind
+            a dependency cycle; they are appended to order in discovery order.
+        """
+        # Discover the affected subgraph depth-first, children in pair order
+        discovered = {}
+        child_lists = {}
+        stack = list(reversed(root_ids))
+        while stack:
+            obj_id = stack.pop()
+            if obj_id in discovered:
+                continue
+            discovered[obj_id] = len(discovered)
+            child_lists[obj_id] = list(dict.fromkeys(self.get_children(obj_id))) if follow(obj_id) else []
+            stack.extend(reversed(child_lists[obj_id]))
+
+        # Kahn's algorithm over the subgraph, earliest-discovered ready object first
+        in_degree = {obj_id:0 for obj_id in discovered}
+        for obj_id in discovered:
+            for child_id in child_lists[obj_id]:
+                in_degree[child_id] += 1
+        ready = [(index,obj_id) for obj_id, index in discovered.items() if in_degree[obj_id] == 0]
+        heapq.heapify(ready)
+        order = []
+        while ready:
+            obj_id = heapq.heappop(ready)[1]
+            order.append(obj_id)
+            for child_id in child_lists[obj_id]:
+                in_degree[child_id] -= 1
+                if in_degree[child_id] == 0:
+                    heapq.heappush(ready,(discovered[child_id],child_id))
+
+        cycle_ids = [obj_id for obj_id in discovered if in_degree[obj_id] > 0]
+        return([order+cycle_ids,cycle_ids])
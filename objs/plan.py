@@ -5,15 +5,19 @@
 import pandas as pd
 import json as json
 import numpy as np
-import plotly.express as px
 import copy
+import io
+import time
+import warnings
 
 # import sys
 # sys.path.append('../utils')
 import utils.utilities
 import objs.financial_objects
+import objs.networks
+import objs.deferred
 import utils.tax_functions
-import utils.plotting
+import utils.tables
 
 # Define a custom encoder for converting int64s
 # and other non-serializable np data types:
@@ -27,10 +31,46 @@ class NpEncoder(json.JSONEncoder):
             return float(obj)
         if isinstance(obj, np.ndarray):
             return obj.tolist()
-        if isinstance(obj, (pd.Series,pd.DataFrame)):
+        if isinstance(obj, pd.Series):
+            return utils.utilities.series_to_json(obj)
+        if isinstance(obj, pd.DataFrame):
             return obj.to_dict()
+        if isinstance(obj, objs.deferred.Deferred):
+            return obj.load()
         return json.JSONEncoder.default(self, obj)
 
+# Encoder for the binary plan format (Plan.save to a .npz file): numeric and boolean Series and
+# DataFrame columns are collected as rows of one matrix per dtype and length (so series on the
+# plan calendar share a block) and written to the JSON manifest as references to those rows
+class ArrayEncoder(NpEncoder):
+    """JSON encoder that stores numeric Series and DataFrame columns as array rows."""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.rows = {}
+    
+    def add_row(self, values):
+        """Reference to values stored as the next row of their dtype and length's block."""
+        block = f'{values.dtype.name}_{len(values)}'
+        self.rows.setdefault(block,[]).append(values)
+        return({'block':block,'row':len(self.rows[block])-1})
+    
+    def blocks(self):
+        """Stacked blocks by name."""
+        return({block:np.stack(rows) for block, rows in self.rows.items()})
+    
+    def default(self, obj):
+        if isinstance(obj, pd.Series) and obj.dtype.kind in 'iufb':
+            start = utils.utilities.offset_start(obj.index)
+            if start is not None:
+                return({utils.utilities.ARRAY_KEY:self.add_row(obj.to_numpy()) | {'start':start}})
+        if isinstance(obj, pd.DataFrame) and pd.api.types.is_integer_dtype(obj.index.dtype):
+            start = utils.utilities.offset_start(obj.index)
+            index = {'start':start} if start is not None else self.add_row(obj.index.to_numpy())
+            data = [self.add_row(obj.iloc[:,i].to_numpy()) if obj.dtypes.iloc[i].kind in 'iufb' else {'values':obj.iloc[:,i].tolist()} for i in range(obj.shape[1])]
+            return({utils.utilities.FRAME_KEY:{'index':index,'index_name':obj.index.name,'length':len(obj),'columns':obj.columns.tolist(),'data':data}})
+        return super().default(obj)
+
 
 # People
 # | attr: cal_yr,age ; dependent (logical) ; pet (logical - optional)
@@ -38,6 +78,8 @@ class NpEncoder(json.JSONEncoder):
 class Person:
     """Represents a person in the financial plan."""
     counter = 0
+    # Loaded on first use after a lazy load (see objs.deferred)
+    child_cost_df = objs.deferred.DeferredAttr()
     def __init__(self,name,birth_year,cal_year,dependent,pet=False):
         Person.counter += 1
         
@@ -51,6 +93,7 @@ class Person:
         self.current_age = cal_year[cal_year.index[0]]-birth_year #integer
         self.age = pd.Series([self.current_age+i for i in range(len(cal_year))],index=self.cal_year)
         self.dependent = dependent #logical
+        self.tax_jurisdiction = None #string, state tax jurisdiction if not the plan's
         # if self.dependent:
         #     self.age = self.age.loc[self.age < 18]
         #self.pet = pet #perhaps add a pet as a "person" eventually
@@ -58,6 +101,12 @@ class Person:
         # Child cost DataFrame for dependents
         self.child_cost_df = None
         
+    def __setattr__(self,name,value):
+        # Renaming a person has to reach the plan's name index (see ObjectRegistry)
+        if name == 'name':
+            objs.financial_objects.track_rename(self,value)
+        object.__setattr__(self,name,value)
+        
     def standardize_timeseries(self,cal_year):
         """Standardize person's time series to match plan calendar."""
         self.cal_year = cal_year
@@ -65,14 +114,117 @@ class Person:
         self.age = pd.Series([self.current_age+i for i in range(len(cal_year))],index=self.cal_year)
         return(self)
         
+    def serial_attrs(self,inputs_only=False):
+        """(name, value) of the attributes saved with the plan, without copying them (all are inputs)."""
+        return(self.__dict__.items())
+        
     def to_serializable(self):
         """Convert person to JSON-serializable format."""
-        out = copy.deepcopy({key:(value.to_dict() if isinstance(value,pd.Series) else value) for key, value in self.__dict__.items()})
+        attrs = {key:objs.deferred.resolve(value) for key, value in self.serial_attrs()}
+        out = copy.deepcopy({key:(value.to_dict() if isinstance(value,pd.Series) else value) for key, value in attrs.items()})
         # Handle DataFrame serialization
         if 'child_cost_df' in out and out['child_cost_df'] is not None:
             out['child_cost_df'] = out['child_cost_df'].to_dict()
         return(out)
 
+# Object Registry
+# | id -> object index over the plan's object lists, with an (obj_type, name) secondary
+# | index (resolved by person) backing get_id_from_name. The object lists are only ever
+# | appended to or reassigned, so the registry re-syncs by watching each list's identity
+# | and length: appended objects are indexed incrementally, anything else is a rebuild.
+# | Objects renamed in place are caught through objs.financial_objects.renames, which the
+# | name index re-reads names on when it has moved.
+
+class ObjectRegistry:
+    """Index of plan objects by id and by (obj_type, name)."""
+    obj_lists = ['people','income','expenses','assets','liabilities']
+    
+    def __init__(self):
+        self.by_id = {}
+        self.by_name = {}
+        self.synced = {lst:(None,0) for lst in self.obj_lists}
+        self.renames = objs.financial_objects.renames
+        
+    def register(self,obj):
+        # First object with a given id wins, matching a front-to-back list scan
+        self.by_id.setdefault(obj.id,obj)
+        self.by_name.setdefault((obj.obj_type,obj.name),[]).append(obj)
+        return(self)
+    
+    def rebuild(self,plan):
+        """Re-index every object in the plan."""
+        self.by_id = {}
+        self.by_name = {}
+        self.renames = objs.financial_objects.renames
+        for lst in self.obj_lists:
+            for obj in getattr(plan,lst):
+                self.register(obj)
+            self.synced[lst] = (getattr(plan,lst),len(getattr(plan,lst)))
+        return(self)
+    
+    def rebuild_names(self,plan):
+        """Re-index names only (objects can be renamed in place from the UI)."""
+        self.by_name = {}
+        self.renames = objs.financial_objects.renames
+        for lst in self.obj_lists:
+            for obj in getattr(plan,lst):
+                self.by_name.setdefault((obj.obj_type,obj.name),[]).append(obj)
+        return(self)
+    
+    def sync(self,plan):
+        """Bring the registry up to date with the plan's object lists."""
+        for lst in self.obj_lists:
+            current = getattr(plan,lst)
+            prev, n = self.synced[lst]
+            if current is prev and len(current) == n:
+                continue
+            elif current is prev and len(current) > n:
+                for obj in current[n:]:
+                    self.register(obj)
+                self.synced[lst] = (current,len(current))
+            else:
+                return(self.rebuild(plan))
+        return(self)
+    
+    def unregister(self,plan,obj):
+        """Drop an object that has already been removed from its plan list."""
+        if self.by_id.get(obj.id) is obj:
+            del self.by_id[obj.id]
+        bucket = self.by_name.get((obj.obj_type,obj.name),[])
+        if obj in bucket:
+            bucket.remove(obj)
+        lst = Plan.type_dict[obj.obj_type]
+        prev, n = self.synced[lst]
+        if prev is getattr(plan,lst) and n == len(prev)+1:
+            self.synced[lst] = (prev,len(prev))
+        elif prev is not None:
+            # The list was changed in some other way as well
+            self.synced[lst] = (None,0)
+        return(self)
+    
+    def get_by_name(self,plan,obj_type,name):
+        """Objects of obj_type with the given name, in plan list order."""
+        self.sync(plan)
+        if self.renames != objs.financial_objects.renames:
+            # Something was renamed since names were indexed
+            self.rebuild_names(plan)
+        bucket = self.by_name.get((obj_type,name),[])
+        objects = [obj for obj in bucket if obj.obj_type == obj_type and obj.name == name]
+        if len(objects) == 0 or len(objects) < len(bucket):
+            # Either nothing matched or something in the bucket was renamed
+            self.rebuild_names(plan)
+            objects = list(self.by_name.get((obj_type,name),[]))
+        return(objects)
+
+# Plotting
+# | Plot methods resolve utils.plotting on first use, so the core engine (Plan, financial
+# | objects, tax, utilities) can be imported without plotly
+
+def _plotting():
+    """utils.plotting, imported on first use."""
+    import utils.plotting
+    return(utils.plotting)
+
 # Plan 
 # | attr: people,income,expenses,assets,liabilities (list of obj);assli_pairs, events (list of ordered pairs);indicators (dict of lists)
 # | methods: update_plan,balance_and_tax,income_and_payroll_tax, indicators, to_dataframes?, equalize_timeseries, combine_expenses
@@ -82,6 +234,14 @@ class Person:
 class Plan:
     """Main container for the entire financial plan."""
     counter = 0
+    # Translate id prefix / obj_type to plan attribute
+    type_dict = {'Person':'people','Expense':'expenses','Liability':'liabilities','Income':'income','Asset':'assets'}
+    # Outputs of balance_and_tax, left out of inputs-only saves
+    derived_attrs = ['tax_df_dict','tax_df','analytical_timeseries']
+    # Loaded on first use after a lazy load (see objs.deferred)
+    tax_df_dict = objs.deferred.DeferredAttr()
+    tax_df = objs.deferred.DeferredAttr()
+    analytical_timeseries = objs.deferred.DeferredAttr()
     def __init__(self,name,start_year,n_years,infl_rate,col_rate):
         Plan.counter += 1
         
@@ -129,55 +289,73 @@ class Plan:
         
         # Children
         self.dependents = pd.Series(0,index=self.cal_year)
+        
+        # State tax jurisdiction (a key of data/state_tax_values.json or a registered one)
+        self.tax_jurisdiction = utils.tax_functions.DEFAULT_JURISDICTION
+        
+        # Object lookup index and dependency graph mirroring self.pairs (not serialized)
+        self._registry = ObjectRegistry()
+        self._graph = objs.networks.DependencyGraph()
+        self._projection_count = 0
+        
+        # Results of the last balance_and_tax, reused by incremental recomputes (not serialized)
+        self._tax_cache = {}
+        self._balance_cache = {}
 
-    def reorder_object_ids(self):
-        """Reorder object IDs for consistency and serialization."""
+    @property
+    def graph(self):
+        """Dependency graph of the plan's networks, synced with self.pairs."""
+        return(self._graph.sync(self.pairs))
+
+    @property
+    def projection_count(self):
+        """Number of single-object projections performed on this plan."""
+        return(self.__dict__.get('_projection_count',0))
+    
+    def add_pair(self,network,parent_id,child_id):
+        """Add a [parent, child] pair to a network."""
+        self.graph.add_edge(network,parent_id,child_id)
+        self.pairs[network].append([parent_id,child_id])
+        self._graph.mark_synced(self.pairs)
+        return(self)
+    
+    def remove_pair(self,network,parent_id,child_id):
+        """Remove the first [parent, child] pair from a network."""
+        self.graph.remove_edge(network,parent_id,child_id)
+        self.pairs[network].remove([parent_id,child_id])
+        self._graph.mark_synced(self.pairs)
+        return(self)
+
+    def serial_order(self):
+        """
+        Object lists in saved order (largest start-year value first) and the id remapping that
+        numbers each list in that order, without changing the plan.
+        """
+        def sort_key(obj):
+            value = obj.value
+            if isinstance(value, pd.Series):
+                if obj.start_year in value.index:
+                    return value[obj.start_year]
+                if len(value) > 0:
+                    return value.iloc[0]
+                return 0
+            return value
+        lists = {}
         replace_dict = {}
-        # Normalize pairs before remapping IDs
-        self.pairs = utils.utilities.normalize_pairs(self.pairs)
         for lst in ['income','expenses','assets','liabilities']:
-            def sort_key(obj):
-                value = obj.value
-                if isinstance(value, pd.Series):
-                    if obj.start_year in value.index:
-                        return value[obj.start_year]
-                    if len(value) > 0:
-                        return value.iloc[0]
-                    return 0
-                return value
-            setattr(self,lst,sorted(getattr(self,lst),key=sort_key, reverse=True))
-            replace_dict |= {obj.id:(obj.id.split('_')[0]+'_'+str(getattr(self,lst).index(obj)+1)) for obj in getattr(self,lst)}
-        for obj in self.income+self.expenses+self.assets+self.liabilities:
-            # Update ID, paired attributes, and downpayment (if relevant)
-            obj.id = replace_dict[obj.id]
-            obj.paired_attr = {
-                key_: {replace_dict.get(key, key): val for key, val in obj.paired_attr[key_].items()}
-                for key_ in ['series', 'time', 'share']
-            }
-            if 'down_payment_sources' in self.__dict__.keys():
-                self.down_payment_sources['id'] = self.down_payment_sources['id'].apply(lambda x: replace_dict[x]) 
-            
-        # Change external lists: pairs, events, drawdown order   
+            lists[lst] = sorted(getattr(self,lst),key=sort_key, reverse=True)
+            replace_dict |= {obj.id:(obj.id.split('_')[0]+'_'+str(i+1)) for i, obj in enumerate(lists[lst])}
+        return(lists,replace_dict)
+    
+    def remapped_pairs(self,replace_dict):
+        """Normalized pairs with ids remapped."""
         updated_pairs = {}
-        for key in ['series', 'time', 'share']:
-            new_list = []
-            for pair in self.pairs.get(key, []):
-                if isinstance(pair, (list, tuple)) and len(pair) > 1:
-                    new_list.append([replace_dict.get(pair[0], pair[0]), replace_dict.get(pair[1], pair[1])])
-                elif isinstance(pair, dict):
-                    new_pair = copy.deepcopy(pair)
-                    if 'parent' in new_pair:
-                        new_pair['parent'] = replace_dict.get(new_pair['parent'], new_pair['parent'])
-                    if 'source' in new_pair:
-                        new_pair['source'] = replace_dict.get(new_pair['source'], new_pair['source'])
-                    if 'child' in new_pair:
-                        new_pair['child'] = replace_dict.get(new_pair['child'], new_pair['child'])
-                    if 'target' in new_pair:
-                        new_pair['target'] = replace_dict.get(new_pair['target'], new_pair['target'])
-                    new_list.append(new_pair)
-            updated_pairs[key] = new_list
-        self.pairs = updated_pairs
-        self.drawdown_order = {key:[replace_dict.get(obj_id, obj_id) for obj_id in val] for key, val in self.drawdown_order.items()}
+        for key, pairs in utils.utilities.normalize_pairs(self.pairs).items():
+            updated_pairs[key] = [[replace_dict.get(pair[0], pair[0]), replace_dict.get(pair[1], pair[1])] for pair in pairs]
+        return(updated_pairs)
+    
+    def remapped_events(self,replace_dict):
+        """Events with object ids (and event sources) remapped."""
         updated_events = []
         for year, label, payload in self.events:
             # Update payload if it's an object ID or a dict containing IDs
@@ -188,29 +366,153 @@ class Plan:
                 updated_events.append([year, label, payload])
             else:
                 updated_events.append([year, label, replace_dict.get(payload, payload)])
-        self.events = updated_events
+        return(updated_events)
+
+    def reorder_object_ids(self):
+        """Reorder object IDs for consistency and serialization."""
+        lists, replace_dict = self.serial_order()
+        for lst in ['income','expenses','assets','liabilities']:
+            setattr(self,lst,lists[lst])
+        for obj in self.income+self.expenses+self.assets+self.liabilities:
+            # Update ID, paired attributes, and downpayment (if relevant)
+            obj.id = replace_dict[obj.id]
+            obj.paired_attr = obj.remapped_paired_attr(replace_dict)
+            if 'down_payment_sources' in self.__dict__.keys():
+                self.down_payment_sources['id'] = self.down_payment_sources['id'].apply(lambda x: replace_dict[x]) 
+            
+        # Change external lists: pairs, events, drawdown order   
+        self.pairs = self.remapped_pairs(replace_dict)
+        self.drawdown_order = {key:[replace_dict.get(obj_id, obj_id) for obj_id in val] for key, val in self.drawdown_order.items()}
+        self.events = self.remapped_events(replace_dict)
+        
+        # Ids changed in place, so the registry has to be rebuilt
+        self._registry.rebuild(self)
         
         return(self)
     
+    def write_json(self,out,encoder=None,inputs_only=False):
+        """
+        Write the plan as JSON to a text file handle, as saved by to_json_string.
+        
+        Streams the live plan one attribute at a time: objects are written in saved order with
+        their ids remapped on the way out (see serial_order) rather than by reordering a copy,
+        and Series are written as year-offset value arrays (utils.utilities.series_to_json).
+        Nothing in the plan is changed or copied beyond the attribute being written. encoder
+        (an NpEncoder by default) encodes each attribute.
+        
+        With inputs_only, derived attributes (Plan.derived_attrs and each object's) are left
+        out; loading rebuilds them (see rebuild_derived). Either way the file ends with
+        'schema_version' (utils.utilities.PLAN_SCHEMA_VERSION), 'inputs_only' and
+        'inputs_hash', the hash of the plan's inputs (see inputs_hash).
+        """
+        encoder = encoder if encoder is not None else NpEncoder()
+        self._write_attrs(out.write,encoder,inputs_only)
+        out.write(', "schema_version": '+json.dumps(utils.utilities.PLAN_SCHEMA_VERSION)+', "inputs_only": '+json.dumps(inputs_only)+', "inputs_hash": '+json.dumps(self.inputs_hash())+'}')
+        return(out)
+    
+    def _write_attrs(self,write,encoder,inputs_only,canonical=False):
+        """
+        Write the opening brace and the plan's saved attributes (see write_json), the plan's
+        and each object's in name order if canonical.
+        """
+        lists, replace_dict = self.serial_order()
+        lists['people'] = self.people
+        remapped = {'pairs':self.remapped_pairs(replace_dict),
+                    'drawdown_order':{key:[replace_dict.get(obj_id, obj_id) for obj_id in val] for key, val in self.drawdown_order.items()},
+                    'events':self.remapped_events(replace_dict)}
+        
+        def write_item(key,value,first):
+            # One attribute at a time, with the C encoder
+            write(('' if first else ', ')+json.dumps(key)+': '+encoder.encode(value))
+        
+        write('{')
+        # Private attributes (e.g. the object registry) are never saved
+        keys = [key for key in self.__dict__ if key[0] != '_' and not (inputs_only and key in self.derived_attrs)]
+        for i, key in enumerate(sorted(keys) if canonical else keys):
+            if key in lists:
+                write(('' if i == 0 else ', ')+json.dumps(key)+': [')
+                # One object at a time
+                for j, obj in enumerate(lists[key]):
+                    attrs = obj.serial_attrs(inputs_only)
+                    attrs = dict(sorted(attrs) if canonical else attrs)
+                    if obj.obj_type != 'Person':
+                        attrs['id'] = replace_dict[attrs['id']]
+                        if 'paired_attr' in attrs:
+                            attrs['paired_attr'] = obj.remapped_paired_attr(replace_dict)
+                    write(('' if j == 0 else ', ')+encoder.encode(attrs))
+                write(']')
+            else:
+                write_item(key,remapped.get(key,self.__dict__[key]),i == 0)
+    
+    def inputs_hash(self):
+        """
+        Hash of the plan's inputs: of its inputs-only JSON with attributes and dict keys in name
+        order (so it doesn't depend on the order they were set in). A saved plan whose stored
+        hash still matches its inputs has valid derived attributes.
+        """
+        hasher = utils.utilities.HashWriter()
+        self._write_attrs(hasher.write,NpEncoder(sort_keys=True),True,canonical=True)
+        return(hasher.hexdigest())
+    
+    def rebuild_derived(self):
+        """Recompute derived attributes: project every object once, then balance_and_tax."""
+        self = self.project_all()
+        self = self.balance_and_tax()
+        return(self)
+    
     def to_json_string(self):
-        """Convert plan to JSON string for saving."""
-        temp = copy.deepcopy(self)
-        temp = temp.reorder_object_ids()
-        for key in temp.__dict__:
-            if isinstance(temp.__dict__[key],pd.Series):
-                temp.__dict__[key] = temp.__dict__[key].to_dict()
-            if key in ['people','income','expenses','assets','liabilities']:
-                temp.__dict__[key] = [obj.to_serializable() for obj in temp.__dict__[key]]
-        return(json.dumps(temp.__dict__,cls=NpEncoder))
+        """Convert plan to JSON string for saving (see write_json)."""
+        return(self.write_json(io.StringIO()).getvalue())
+    
+    def save(self,path,inputs_only=False):
+        """
+        Save the plan to path: a binary bundle if it ends in .npz, JSON otherwise. With
+        inputs_only, derived attributes aren't saved and are rebuilt on load (see write_json).
+        
+        The binary bundle is a compressed .npz holding the JSON manifest (as written by
+        write_json) with numeric Series and DataFrame columns replaced by references to rows of
+        int64/float64/bool blocks stored alongside it (see ArrayEncoder). Unlike JSON, it keeps
+        DataFrames with repeated index values (tax_df) whole. Load either format with Plan.load.
+        """
+        if str(path).endswith('.npz'):
+            encoder = ArrayEncoder()
+            manifest = self.write_json(io.StringIO(),encoder,inputs_only).getvalue()
+            np.savez_compressed(path,manifest=np.frombuffer(manifest.encode('utf-8'),dtype=np.uint8),**encoder.blocks())
+        else:
+            with open(path,'w') as out:
+                self.write_json(out,inputs_only=inputs_only)
+        return(self)
+    
+    @staticmethod
+    def load(path,timings=None,lazy=False):
+        """
+        Load a plan saved with Plan.save (path, or an open binary file for .npz bundles). If
+        timings is a dict, the seconds spent reading the file ('read') and in each phase of
+        json_to_plan are added to it. With lazy, heavy attributes (tax frames, analytical
+        time series, amortization tables, child cost frames) are loaded on first use.
+        """
+        timings = timings if timings is not None else {}
+        start = time.perf_counter()
+        name = str(getattr(path,'name',path))
+        if name.endswith('.npz'):
+            with np.load(path,allow_pickle=False) as bundle:
+                blocks = {block:bundle[block] for block in bundle.files if block != 'manifest'}
+                manifest = bundle['manifest'].tobytes().decode('utf-8')
+            indexes = {}
+            timings['read'] = timings.get('read',0) + time.perf_counter() - start
+            return(utils.utilities.json_to_plan(manifest,object_hook=lambda dictionary: utils.utilities.json_to_array(dictionary,blocks,indexes,lazy),timings=timings,lazy=lazy))
+        with open(path,'r') as j:
+            json_string = j.read()
+        timings['read'] = timings.get('read',0) + time.perf_counter() - start
+        return(utils.utilities.json_to_plan(json_string,timings=timings,lazy=lazy))
 
     #Error handling needed here
         
     def get_id_from_name(self,obj_type,name,person=None):
+        objects = self._registry.get_by_name(self,obj_type,name)
         if obj_type == 'Person':
-            return(next((obj.id for obj in self.people if ((obj.obj_type == obj_type)&(obj.name == name))), None))
+            return(next((obj.id for obj in objects), None))
         else:
-            objects = [obj for obj in self.income+self.expenses+self.assets+self.liabilities if ((obj.obj_type == obj_type)&(obj.name == name))]
-            
             # if multiple objects and person
             if len(objects) == 0:
                 #print('No objects found')
@@ -237,7 +539,7 @@ class Plan:
 
     def get_object_from_id(self,ID):
         """Get object by ID from any object list."""
-        return(next((obj for obj in self.people+self.income+self.expenses+self.assets+self.liabilities if obj.id == ID), None))
+        return(self._registry.sync(self).by_id.get(ID))
 
     def get_object_from_name(self,obj_type,name,person=None):
         obj_id = self.get_id_from_name(obj_type,name,person)
@@ -249,16 +551,13 @@ class Plan:
 
     def remove_object_by_id(self,ID):
         """Remove object and all its dependencies from the plan."""
-        # Translate id prefix to plan attribute
-        type_dict = {'Person':'people','Expense':'expenses','Liability':'liabilities','Income':'income','Asset':'assets'}
-        
         # Get ids in the plan attribute containing ID
-        lst = type_dict[ID.split('_')[0]]
+        lst = self.type_dict[ID.split('_')[0]]
         id_list = [obj.id for obj in getattr(self,lst)]
         
         # Get parents and children
-        parent_ids = list(set([pair[0] for pair_list in self.pairs.values() for pair in pair_list if pair[1]==ID]))
-        child_ids = list(set([pair[1] for pair_list in self.pairs.values() for pair in pair_list if pair[0]==ID]))
+        parent_ids = list(set(self.graph.get_parents(ID)))
+        child_ids = list(set(self.graph.get_children(ID)))
         
         # Break links with children, remove if necessary
         for child_id in child_ids:
@@ -268,24 +567,63 @@ class Plan:
                 self = self.remove_object_by_id(child_id)
         
         # Remove from plan.pairs
+        self.graph.remove_node(ID)
         self.pairs = {key:[pair for pair in self.pairs[key] if ID not in pair] for key in self.pairs.keys()}
+        self._graph.mark_synced(self.pairs)
         
         # If any parents are no longer in pairs, set dependent_objs to false:
         for parent_id in parent_ids:
-            if parent_id not in set([pair[0] for pair_list in self.pairs.values() for pair in pair_list]):
+            if len(self.graph.get_children(parent_id)) == 0:
                 self.get_object_from_id(parent_id).dependent_objs = False
         
         # Remove object, and remove from drawdown order just in case
-        del getattr(self,lst)[id_list.index(ID)]
+        # (children may have been removed from the same list above, so re-index)
+        id_list = [obj.id for obj in getattr(self,lst)]
+        obj = getattr(self,lst).pop(id_list.index(ID))
+        self._registry.unregister(self,obj)
         self.drawdown_order = {person:[x for x in lst if x != ID] for person, lst in self.drawdown_order.items()}
         
         return(self)
     
+    def project_objects(self,objects):
+        """
+        Project objects and every object downstream of them in the dependency networks.
+
+        The affected subgraph is computed once and projected in topological order, so
+        each object is projected exactly once, after all of its affected parents.
+
+        Args:
+            objects: List of financial objects (or object ids) that have changed
+        """
+        roots = {}
+        for obj in objects:
+            if isinstance(obj,str):
+                obj = self.get_object_from_id(obj)
+            if obj is not None and obj.id not in roots:
+                roots[obj.id] = obj
+
+        def get_obj(obj_id):
+            return(roots[obj_id] if obj_id in roots else self.get_object_from_id(obj_id))
+
+        def follow(obj_id):
+            obj = get_obj(obj_id)
+            return(obj is not None and obj.dependent_objs == True)
+
+        order, cycle_ids = self.graph.get_projection_order(list(roots.keys()),follow)
+        if len(cycle_ids) > 0:
+            print('Dependency cycle between '+', '.join(cycle_ids)+' - projecting these in discovery order')
+
+        for obj_id in order:
+            obj = get_obj(obj_id)
+            if obj is None:
+                continue
+            self = obj.project_self(self)
+            self._projection_count = self.projection_count + 1
+        return(self)
+
     def project_all(self):
         """Project all objects in the plan forward through time."""
-        for obj in self.income+self.expenses+self.liabilities+self.assets:
-            self = obj.project(self)
-        return(self)
+        return(self.project_objects(self.income+self.expenses+self.liabilities+self.assets))
     
     def get_tax_keyword_objects(self,tax_keyword):
         if isinstance(tax_keyword,str):
@@ -296,8 +634,12 @@ class Plan:
     def standardize_all_series(self):
         """Standardize all time series to match plan calendar."""
         ## ADD PLAN ATTRIBUTE SERIES: Marriage (Logical), Combined_Expenses (Logical), Dependents (Integer) 
-        for obj in self.people+self.income+self.expenses+self.assets+self.liabilities:
+        for obj in self.people:
             obj = obj.standardize_timeseries(self.cal_year)
+        # Financial objects remember what they were last aligned to; skip the unchanged ones
+        for obj in self.income+self.expenses+self.assets+self.liabilities:
+            if len(obj.get_unaligned_attrs(self.cal_year)) > 0:
+                obj = obj.standardize_timeseries(self.cal_year)
         return(self)
         
     def aggregate(self,obj_type,person='Joint'):
@@ -354,8 +696,8 @@ class Plan:
             self.share_props = pd.Series(0.5,index=self.cal_year)
         return(self)
     
-    def drawdown(self,amt,year,person,keyword=None):
-        """Draw down from assets in specified order when expenses exceed income."""
+    def drawdown(self,amt,year,person,keyword=None,accounts=None):
+        """Draw down from assets in specified order (the person's, or accounts) when expenses exceed income."""
         # drawdown amt is ALWAYS negative, which means positive values are passed to 
         # asset.contribution. Instead, we are always making withdrawals in this function, and 
         # thus operate through transaction (unless I add a 'withdrawal' component when I componentize
@@ -367,32 +709,163 @@ class Plan:
             # Work with a positive remaining balance
             amt_remaining = -amt
             counter = 0
-            drawdown_list = self.drawdown_order.get(person, [])
+            drawdown_list = self.drawdown_assets(accounts if accounts is not None else self.drawdown_order.get(person, []))
             if len(drawdown_list) == 0:
                 return(self)
             while amt_remaining > 0:
                 if counter >= len(drawdown_list):
                     break
                 acct_id = drawdown_list[counter]
-                if acct_id.split('_')[0] == 'Liability':
-                    sign = 1
-                    keyword = 'charges'
-                    # will need to fix below if credit cards are added
-                else:
-                    sign = -1
-                    if keyword == None:
-                        keyword = 'contribution'
+                series = self.drawdown_series(acct_id,keyword)
                 acct_val = self.get_object_from_id(acct_id).value[year]
                 if amt_remaining >= acct_val:
-                    getattr(self.get_object_from_id(acct_id),keyword)[year] = sign*acct_val
+                    series[year] = -1*acct_val
                     amt_remaining -= acct_val
                     counter += 1
                 else:
-                    getattr(self.get_object_from_id(acct_id),keyword)[year] = sign*amt_remaining
+                    series[year] = -1*amt_remaining
                     amt_remaining = 0
                 self = self.get_object_from_id(acct_id).project(self)
         return(self)
     
+    def drawdown_assets(self,accounts):
+        """
+        The accounts a drawdown can write to, in order: liabilities are skipped with a warning,
+        since drawing credit from one isn't modelled (its balance and payments don't depend on it).
+        """
+        liabs = [acct_id for acct_id in accounts if acct_id.split('_')[0] == 'Liability']
+        if len(liabs) == 0:
+            return(accounts)
+        warnings.warn('Drawing down from liabilities is not supported; skipping '+', '.join(liabs))
+        return([acct_id for acct_id in accounts if acct_id not in liabs])
+    
+    def drawdown_series(self,acct_id,keyword=None):
+        """The series a drawdown writes an account's (negative) withdrawals to: keyword, contribution by default."""
+        return(getattr(self.get_object_from_id(acct_id),keyword if keyword is not None else 'contribution'))
+    
+    def drawdown_accounts(self,accounts,keyword=None):
+        """
+        Objects for accounts whose drawdown capacities can be read without projecting between
+        years: unsold assets starting within the calendar whose value and keyword series aren't
+        paired from other objects, none of them depending on another account in the list. None
+        if any account doesn't qualify.
+        """
+        flow = keyword if keyword is not None else 'contribution'
+        accts = [self.get_object_from_id(acct_id) for acct_id in accounts]
+        ids = set(accounts)
+        for obj in accts:
+            if obj is None or obj.obj_type != 'Asset':
+                return(None)
+            if getattr(obj,'sold',0) != 0 or obj.start_year not in obj.cal_year.values:
+                return(None)
+            if len(set(['value',flow]) & set([pair[1] for pairs in obj.paired_attr['series'].values() for pair in pairs])) > 0:
+                return(None)
+            if len(set([desc for descs in self.graph.get_descendants(obj.id).values() for desc in descs]) & ids) > 0:
+                return(None)
+        return(accts)
+    
+    def drawdown_matrix(self,deficit,accounts=None,person=None,keyword=None):
+        """
+        The amounts Plan.drawdown would write for each year of a deficit, without applying them.
+        
+        Args:
+            deficit: Series of amounts by year; only negative years are drawn down
+            accounts: Ordered account ids (defaults to the person's drawdown order)
+            person: Person whose drawdown order to use when accounts isn't given
+            keyword: Asset series to withdraw through (contribution by default)
+            
+        Returns:
+            DataFrame (calendar years x account ids) of the (negative) amounts written, NaN where an
+            account isn't drawn on, or None if the accounts' capacities can't be read without
+            projecting (see drawdown_accounts). Liabilities are skipped (see drawdown_assets)
+        """
+        if accounts is None:
+            accounts = self.drawdown_order.get(person,[])
+        cascade = self._drawdown_cascade(deficit,self.drawdown_assets(accounts),keyword)
+        if cascade is None:
+            return(None)
+        accts, written, drawn = cascade[:3]
+        matrix = pd.DataFrame({obj.id:pd.Series(written[i],index=self.cal_year.values) for i, obj in enumerate(accts)},index=self.cal_year.values,columns=[obj.id for obj in accts])
+        return(matrix.where(pd.DataFrame(drawn.T,index=self.cal_year.values,columns=matrix.columns)))
+    
+    def _drawdown_cascade(self,deficit,accounts,keyword=None):
+        """
+        (accounts, written series as lists, drawn mask (accounts x years), recurrences, first position)
+        for a multi-year drawdown, reading each asset's capacity from its compound recurrence year
+        by year; None if not applicable.
+        """
+        accts = self.drawdown_accounts(accounts,keyword)
+        if accts is None:
+            return(None)
+        years = self.cal_year.tolist()
+        need = np.array([-deficit[yr] if yr in deficit.index and deficit[yr] < 0 else 0 for yr in years])
+        positions = np.flatnonzero(need > 0)
+        first_pos = int(positions[0]) if len(positions) > 0 else len(years)
+        flow = keyword if keyword is not None else 'contribution'
+        written = [getattr(obj,flow).tolist() for obj in accts]
+        recurrences = [objs.financial_objects.CompoundRecurrence(obj,first_pos,flow) for obj in accts]
+        drawn = np.zeros((len(accts),len(years)),dtype=bool)
+        
+        # An asset's capacity compounds from earlier withdrawals: cascade one year at a time
+        for pos in range(first_pos,len(years)):
+            if need[pos] > 0:
+                capacity = np.array([[int(recurrence.value_at(pos,written[i][pos])) for i, recurrence in enumerate(recurrences)]])
+                taken, drawn_ = utils.utilities.drawdown_cascade(need[pos:pos+1],capacity)
+                for i in np.flatnonzero(drawn_[0]):
+                    written[i][pos] = -1*taken[0,i]
+                drawn[:,pos] = drawn_[0]
+            for i, recurrence in enumerate(recurrences):
+                recurrence.record(pos,written[i][pos])
+        return((accts,written,drawn,recurrences,first_pos))
+    
+    def drawdown_years(self,deficit,person=None,accounts=None,keyword=None):
+        """
+        Draw down a deficit over several years at once, as Plan.drawdown does year by year.
+        
+        Computes every year's withdrawals with the cumulative-capacity cascade (see drawdown_matrix),
+        writes each account's series once and projects each account (and its dependents) once.
+        Liabilities are skipped (see drawdown_assets). The projected asset values are checked
+        against their recurrence, and the written series against what was written; if the accounts
+        depend on each other or a check fails, the years are drawn down one at a time with
+        Plan.drawdown instead.
+        
+        Args:
+            deficit: Series of amounts by year; only negative years are drawn down
+            person: Person whose drawdown order to use when accounts isn't given
+            accounts: Ordered account ids (defaults to the person's drawdown order)
+            keyword: Asset series to withdraw through (contribution by default)
+            
+        Returns:
+            Updated plan object
+        """
+        if accounts is None:
+            accounts = self.drawdown_order.get(person,[])
+        accounts = self.drawdown_assets(accounts)
+        if len(accounts) == 0:
+            return(self)
+        cascade = self._drawdown_cascade(deficit,accounts,keyword)
+        if cascade is not None:
+            accts, written, drawn, recurrences, first_pos = cascade
+            touched = [i for i in range(len(accts)) if drawn[i].any()]
+            saved = {i:self.drawdown_series(accts[i].id,keyword).copy() for i in touched}
+            for i in touched:
+                series = self.drawdown_series(accts[i].id,keyword)
+                for pos in np.flatnonzero(drawn[i]):
+                    series.iloc[pos] = written[i][pos]
+            expected = {i:self.drawdown_series(accts[i].id,keyword).copy() for i in touched}
+            self = self.project_objects([accts[i] for i in touched])
+            # Projection re-aligns the series from each asset's start year, so compare from there
+            if all([recurrences[i].matches(accts[i],first_pos)
+                    and self.drawdown_series(accts[i].id,keyword).loc[accts[i].start_year:].equals(expected[i].loc[accts[i].start_year:]) for i in touched]):
+                return(self)
+            for i in touched:
+                self.drawdown_series(accts[i].id,keyword)[:] = saved[i]
+            self = self.project_objects([accts[i] for i in touched])
+        for yr in self.cal_year:
+            if yr in deficit.index and deficit[yr] < 0:
+                self = self.drawdown(deficit[yr],yr,person,keyword,accounts=accounts)
+        return(self)
+    
     def combine_expense(self,obj_name,comb_year):
         if len(self.people) == 1:
             return(self)
@@ -411,8 +884,10 @@ class Plan:
                 # Clean up any global pairs that referenced the prior joint expense
                 self.pairs = {k:[pair for pair in self.pairs[k] if obj_id not in pair] for k in self.pairs.keys()}
                 # Remove the joint expense from working list and plan storage
+                joint_obj = self.get_object_from_id(obj_id)
                 expenses = [obj for obj in expenses if obj.id != obj_id]
                 self.expenses = [obj for obj in self.expenses if obj.id != obj_id]
+                self._registry.unregister(self,joint_obj)
                 
             if len(expenses) > 0:
                 # Sum indexed series of values for the combined objects, prune it
@@ -483,24 +958,65 @@ class Plan:
         return self
                 
                 
-    def calculate_income_and_payroll_tax(self):
+    def calculate_income_and_payroll_tax(self,incremental=False,workers=None):
         # returns a tax_df_dict
         
-        self.tax_df_dict = utils.tax_functions.calculate_income_and_payroll_tax(self)
+        self.tax_df_dict = utils.tax_functions.calculate_income_and_payroll_tax(self,incremental,workers)
         return(self)
 
-    def balance_and_tax(self):
-        """Calculate taxes and balance income vs expenses."""
-        self = self.calculate_income_and_payroll_tax()
-        self = utils.tax_functions.balance_and_tax(self)
+    def balance_and_tax(self,incremental=False):
+        """
+        Calculate taxes and balance income vs expenses.
+        
+        With incremental=True, filers whose tax inputs are unchanged reuse their last
+        results, and each person's balance is only rerun from the first year whose
+        inputs changed. The default recomputes everything.
+        """
+        self = self.calculate_income_and_payroll_tax(incremental)
+        self = utils.tax_functions.balance_and_tax(self,incremental)
+        return(self)
+    
+    def get_dirty_objects(self):
+        """Objects with attributes changed since they were last projected."""
+        return([obj for obj in self.income+self.expenses+self.liabilities+self.assets if len(obj.dirty_attrs) > 0])
+    
+    def recompute(self,full=False,check=False):
+        """
+        Bring projections, taxes and balances up to date after edits.
+        
+        Projects the objects that changed since their last projection (and their
+        dependents), then runs an incremental balance_and_tax.
+        
+        Args:
+            full: Recompute all taxes and balances instead
+            check: Also run the full recompute on a copy of the plan and raise an
+                   AssertionError if its results differ from the incremental ones
+        """
+        dirty_objs = self.get_dirty_objects()
+        if len(dirty_objs) > 0:
+            self = self.project_objects(dirty_objs)
+        
+        if check:
+            full_plan = copy.deepcopy(self).balance_and_tax()
+        
+        self = self.balance_and_tax(incremental=not full)
+        
+        if check:
+            attrs = ['tax_df','analytical_timeseries','income','expenses','assets','liabilities']
+            diffs = utils.utilities.compare_values({attr:getattr(self,attr) for attr in attrs},
+                                                   {attr:getattr(full_plan,attr) for attr in attrs})
+            if len(diffs) > 0:
+                raise AssertionError('Incremental recompute differs from full recompute at: '+', '.join(diffs))
         return(self)
     
     ### Plotting Methods
     
     # Some are fully described methods for simple plots such as pie charts
     # Others are wrappers for more complex plotting functions stored elsewhere
+    # utils.plotting (and plotly) is only imported when a plot is made, see _plotting
     def pie_chart(self,obj_type,year,plot_type='pie',include_events=False,cats_to_ignore=[],person=None):
-        color_dict = (utils.plotting.CASHFLOW_COLORS | {
+        px = _plotting().px
+        color_dict = (_plotting().CASHFLOW_COLORS | {
             'Retirement':'cornflowerblue','Bonds':'cornflowerblue','Real Estate':'gold','Automobile':'gold',
             'Revolving':'darkorange','Installment':'gold'
         })
@@ -532,7 +1048,7 @@ class Plan:
                             rows.append({'name':obj.name,'person':self.get_object_from_id(obj.person).name,'category':obj.category,'value':value,'label':label})
                 plot_df = pd.DataFrame(rows)
             else:
-                people = utils.plotting.make_people_list(self, person) + ['Joint']
+                people = utils.tables.make_people_list(self, person) + ['Joint']
                 objs = [obj for obj in objs if obj.person in people]
                 plot_df = pd.DataFrame({'name':[obj.name for obj in objs],
                                         'person':['Joint' if obj.person == 'Joint' else self.get_object_from_id(obj.person).name for obj in objs],
@@ -569,13 +1085,13 @@ class Plan:
         return(fig)
     
     def expense_plots(self,person,level,after_tax=False):
-        return(utils.plotting.expense_plots(self,person,level,after_tax))
+        return(_plotting().expense_plots(self,person,level,after_tax))
     
     def asset_plots(self,person,level,net_worth_formula=2,include_pension_equivalent=False):
-        return(utils.plotting.asset_plots(self,person,level,net_worth_formula,include_pension_equivalent))
+        return(_plotting().asset_plots(self,person,level,net_worth_formula,include_pension_equivalent))
     
     def cashflow_sankey(self,person,year,comb_all_exp=False,normalize=False):
-        return(utils.plotting.cashflow_sankey(self,person,year,comb_all_exp,normalize))
+        return(_plotting().cashflow_sankey(self,person,year,comb_all_exp,normalize))
     
     def ratio_plot(self,person,names):
         if 'analytical_timeseries' not in self.__dict__.keys():
@@ -583,4 +1099,4 @@ class Plan:
             return()
         else:
             df = self.analytical_timeseries.loc[self.analytical_timeseries['person']==person,:]
-            return(utils.plotting.ratio_plot(df,names))
\ No newline at end of file
+            return(_plotting().ratio_plot(df,names))
\ No newline at end of file
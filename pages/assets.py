@@ -188,6 +188,7 @@ def update_asset(asset_id,obj,attr):
         else:
             new_prop = pd.Series(st.session_state[f"{asset_id}_"+attr].set_axis(st.session_state[f"{asset_id}_"+attr].index.astype(int)))
         obj.paired_attr['series'][prop_key][0][2] = (new_prop, cap_val)
+        obj.mark_dirty('paired_attr')
     
     elif attr == 'props_cap':
         prop_key = [key for key, val in obj.paired_attr['series'].items() if key.split('_')[0]=='Income' and val[0][1]=='contribution'][0]
@@ -195,6 +196,7 @@ def update_asset(asset_id,obj,attr):
         prop_val = pair_val[0] if isinstance(pair_val,(list,tuple)) and len(pair_val) == 2 else pair_val
         cap_val = st.session_state.get(f"{asset_id}_props_cap", 0.0)
         obj.paired_attr['series'][prop_key][0][2] = (prop_val, None if cap_val == 0 else cap_val)
+        obj.mark_dirty('paired_attr')
     
     elif attr == 'match_cap':
         prop_key = [key for key, val in obj.paired_attr['series'].items() if key.split('_')[0]=='Income' and val[0][1]=='contribution'][0]
@@ -210,6 +212,7 @@ def update_asset(asset_id,obj,attr):
             match_prop_val = match_pair_val[0] if isinstance(match_pair_val,(list,tuple)) and len(match_pair_val) == 2 else match_pair_val
             cap_val = st.session_state.get(f"{asset_id}_match_cap", 0.0)
             match_obj.paired_attr['series'][prop_key][match_pair_index][2] = (match_prop_val, None if cap_val == 0 else cap_val)
+            match_obj.mark_dirty('paired_attr')
     
     else:
         setattr(obj,attr,st.session_state[f"{asset_id}_"+attr])
@@ -122,19 +122,16 @@ def update_contribution_rate(income_id, obj):
     new_contribution_rate = st.session_state.get(f'{income_id}_edit_contribution', 0.06)
     
     # Find the pension contribution expense and update its paired attributes
-    for pair_list in st.session_state['plan'].pairs.values():
-        for pair in pair_list:
-            if pair[0] == income_id:
-                child_obj = st.session_state['plan'].get_object_from_id(pair[1])
-                if (child_obj is not None and 
-                    child_obj.obj_type == 'Expense' and 
-                    child_obj.name.startswith('Pension Contribution')):
-                    # Update the contribution rate in the paired attributes
-                    if income_id in child_obj.paired_attr['series']:
-                        for attr_pair in child_obj.paired_attr['series'][income_id]:
-                            if attr_pair[0] == 'value' and attr_pair[1] == 'value':
-                                attr_pair[2] = new_contribution_rate
-                    break
+    for child_id in st.session_state['plan'].graph.get_children(income_id):
+        child_obj = st.session_state['plan'].get_object_from_id(child_id)
+        if (child_obj is not None and 
+            child_obj.obj_type == 'Expense' and 
+            child_obj.name.startswith('Pension Contribution')):
+            # Update the contribution rate in the paired attributes
+            if income_id in child_obj.paired_attr['series']:
+                for attr_pair in child_obj.paired_attr['series'][income_id]:
+                    if attr_pair[0] == 'value' and attr_pair[1] == 'value':
+                        attr_pair[2] = new_contribution_rate
     
     # Reproject the parent income object to trigger expense update
     st.session_state['plan'] = obj.project(st.session_state['plan'])
@@ -356,23 +353,7 @@ def generate_income(income_id,disp_div):
             
             # Recover pension_params if child pension objects exist
             if not hasattr(obj, 'pension_params'):
-                child_ids = []
-                for pair_list in st.session_state['plan'].pairs.values():
-                    if not isinstance(pair_list, (list, tuple)):
-                        continue
-                    for pair in pair_list:
-                        if isinstance(pair, (list, tuple)) and len(pair) > 1:
-                            parent_id, child_id = pair[0], pair[1]
-                        elif isinstance(pair, dict):
-                            if 'value' in pair and isinstance(pair['value'], (list, tuple)) and len(pair['value']) > 1:
-                                parent_id, child_id = pair['value'][0], pair['value'][1]
-                            else:
-                                parent_id = pair.get('parent') or pair.get('source')
-                                child_id = pair.get('child') or pair.get('target')
-                        else:
-                            continue
-                        if parent_id == obj.id:
-                            child_ids.append(child_id)
+                child_ids = st.session_state['plan'].graph.get_children(obj.id)
                 pension_children = []
                 for child_id in child_ids:
                     child_obj = st.session_state['plan'].get_object_from_id(child_id)
@@ -6,6 +6,7 @@ import pandas as pd
 import objs.plan 
 import utils.utilities
 import utils.ui_functions
+import utils.tax_functions
 from utils.emoji_config import *
 
 # Setup page configuration and CSS
@@ -172,6 +173,10 @@ with col1:
                   step=0.005,
                   on_change=update_plan,
                   args=['col_rate'],key="plan_col_rate")
+    st.selectbox("State Tax Jurisdiction",
+                 options=[st.session_state['plan'].tax_jurisdiction]+[name for name in utils.tax_functions.available_jurisdictions() if name != st.session_state['plan'].tax_jurisdiction],
+                 on_change=update_plan,
+                 args=['tax_jurisdiction'],key="plan_tax_jurisdiction")
 
     # with st.expander(label="Savings Drawdown Order: "):
     #     for i in range(len(st.session_state['plan'].drawdown_order)):
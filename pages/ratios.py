@@ -98,7 +98,7 @@ with tabs[0]:
     all_ratios = get_all_ratios()
     ratio_definitions = get_ratio_definitions()
     ratio_latex = get_ratio_latex()
-    ratio_names = [utils.plotting.ratio_rec_dict.get(r, {}).get('name', r) for r in all_ratios]
+    ratio_names = [utils.plotting.ratio_recommendations().get(r, {}).get('name', r) for r in all_ratios]
     ratio_map = dict(zip(ratio_names, all_ratios))
 
     st.selectbox('Person',
@@ -194,7 +194,6 @@ def buy_home(plan,person,start_year,value,asset_dict,liab_dict,down_payment_sour
     insurance.paired_attr['time'] |= {asset_id:[['start_year','start_year',0],['end_year','end_year',0]]}
     plan.pairs['time'].append([asset_id,insurance.id])
     plan.expenses.append(insurance)
-    plan = insurance.project(plan)
 
     # Home Utilities
     utilities = objs.financial_objects.ExpenseObj(
@@ -215,10 +214,10 @@ def buy_home(plan,person,start_year,value,asset_dict,liab_dict,down_payment_sour
     utilities.paired_attr['time'] |= {asset_id:[['start_year','start_year',0],['end_year','end_year',0]]}
     plan.pairs['time'].append([asset_id,utilities.id])
     plan.expenses.append(utilities)
-    plan = utilities.project(plan)
     
-    # Project the home asset, triggering updates of all dependents
-    plan = plan.get_object_from_id(asset_id).project(plan)
+    # Project the new expenses and the home asset together, so that each dependent
+    # is projected once
+    plan = plan.project_objects([insurance,utilities,plan.get_object_from_id(asset_id)])
     
     # Add home purchase to events
     if down_payment_sources != None:
@@ -406,10 +405,12 @@ def edit_child_expenses(plan,child_name,input_df):
             else:
                 expense = plan.get_object_from_name('Expense','Education','Joint')
                 expense.child_components[child.id] = pd.Series(vals_dict[cat][age_start:18],index=child.age.index[child.age.isin(range(age_start,18))])
+                expense.mark_dirty('child_components')
                 plan = expense.project(plan) 
  
                 childcare = plan.get_object_from_name('Expense','Childcare','Joint')
                 childcare.child_components[child.id] = pd.Series(vals_dict[cat][0:age_start],index=child.age.index[child.age.isin(range(0,age_start))])
+                childcare.mark_dirty('child_components')
                 plan = childcare.project(plan)
         else:
             name = cat
@@ -420,6 +421,7 @@ def edit_child_expenses(plan,child_name,input_df):
         else:
             expense = plan.get_object_from_name('Expense',name,'Joint')
             expense.child_components[child.id] = pd.Series(vals_dict[cat][age_start:18],index=child.age.index[child.age.isin(range(age_start,18))])
+            expense.mark_dirty('child_components')
             plan = expense.project(plan) 
               
     return(plan)
\ No newline at end of file
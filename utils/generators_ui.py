@@ -311,7 +311,7 @@ def generate_asset(asset_id,session_state):
     
     # Note - all streamlit objects will be identified with the asset id
     obj = st.session_state['plan'].get_object_from_id(asset_id)
-    paired_ids = list(set([obj_id for pair in [x for val in st.session_state['plan'].pairs.values() for x in val] for obj_id in pair if obj_id != asset_id and asset_id in pair])) #[obj_id for lst in st.session_state['plan'].pairs for obj_id in lst if obj_id != asset_id and asset_id in lst]
+    paired_ids = list(set([obj_id for obj_id in st.session_state['plan'].graph.get_children(asset_id)+st.session_state['plan'].graph.get_parents(asset_id) if obj_id != asset_id]))
 
     # Person
     if obj.person == 'Joint':
@@ -758,7 +758,7 @@ def update_asset(id_list,attr,session_state):
         # Get previously replaced asset - should just be one, but not enforced at the moment
         # Compare to new replacement list - we'll use the -1 start/end for replacements
         
-        old_replaced = [obj_id for obj_id in [x[1] for x in st.session_state['plan'].pairs['time'] if x[0] == asset_id] if st.session_state['plan'].get_object_from_id(obj_id).paired_attr['time'][asset_id][0][2] == -1]
+        old_replaced = [obj_id for obj_id in st.session_state['plan'].graph.get_children(asset_id,'time') if st.session_state['plan'].get_object_from_id(obj_id).paired_attr['time'][asset_id][0][2] == -1]
         new_replaced = st.session_state[f'{asset_id}_assets_replaced']
         to_add = [x for x in new_replaced if x not in old_replaced]
         to_remove = [x for x in old_replaced if x not in new_replaced]
@@ -774,7 +774,7 @@ def update_asset(id_list,attr,session_state):
             obj.end_year = max(obj.cal_year)
             
             # Remove from plan.pairs and project
-            st.session_state['plan'].pairs['time'].remove([asset_id,obj_id])
+            st.session_state['plan'].remove_pair('time',asset_id,obj_id)
             st.session_state['plan'] = obj.project(st.session_state['plan'])
         
         # Add new pairings
@@ -782,15 +782,15 @@ def update_asset(id_list,attr,session_state):
             obj = st.session_state['plan'].get_object_from_id(obj_id)
             obj.end_year = asset_obj.start_year-1
             obj.paired_attr['time'] |= {asset_id:[['start_year','end_year',-1]]}
-            if [asset_id,obj_id] not in st.session_state['plan'].pairs['time']:
-                st.session_state['plan'].pairs['time'].append([asset_id,obj_id])
+            if obj_id not in st.session_state['plan'].graph.get_children(asset_id,'time'):
+                st.session_state['plan'].add_pair('time',asset_id,obj_id)
             st.session_state['plan'] = obj.project(st.session_state['plan'])
         
     elif attr == 'expenses_replaced':
         # Get previously replaced expenses, which are paired expenses that aren't maintenace
         # property_tax, or insurance. Compare to new replacement list - we'll
         # use the -1 start/end for replacements
-        old_replaced = [obj_id for obj_id in [x[1] for x in st.session_state['plan'].pairs['time'] if x[0] == asset_id] if st.session_state['plan'].get_object_from_id(obj_id).paired_attr['time'][asset_id][0][2] == -1]
+        old_replaced = [obj_id for obj_id in st.session_state['plan'].graph.get_children(asset_id,'time') if st.session_state['plan'].get_object_from_id(obj_id).paired_attr['time'][asset_id][0][2] == -1]
         new_replaced = st.session_state[f'{asset_id}_expenses_replaced']
         to_add = [x for x in new_replaced if x not in old_replaced]
         to_remove = [x for x in old_replaced if x not in new_replaced]
@@ -806,7 +806,7 @@ def update_asset(id_list,attr,session_state):
             obj.end_year = max(obj.cal_year)
             
             # Remove from plan.pairs and project
-            st.session_state['plan'].pairs['time'].remove([asset_id,obj_id])
+            st.session_state['plan'].remove_pair('time',asset_id,obj_id)
             st.session_state['plan'] = obj.project(st.session_state['plan'])
         
         # Add new pairings
@@ -814,8 +814,8 @@ def update_asset(id_list,attr,session_state):
             obj = st.session_state['plan'].get_object_from_id(obj_id)
             obj.end_year = asset_obj.start_year-1
             obj.paired_attr['time'] |= {asset_id:[['start_year','end_year',-1]]}
-            if [asset_id,obj_id] not in st.session_state['plan'].pairs['time']:
-                st.session_state['plan'].pairs['time'].append([asset_id,obj_id])
+            if obj_id not in st.session_state['plan'].graph.get_children(asset_id,'time'):
+                st.session_state['plan'].add_pair('time',asset_id,obj_id)
             st.session_state['plan'] = obj.project(st.session_state['plan'])
         
     elif attr == 'maintenance_rate':
@@ -874,7 +874,7 @@ def remove_asset(id_list,session_state):
         obj.end_year = max(obj.cal_year)
         
         # Remove from plan.pairs and project
-        st.session_state['plan'].pairs['time'].remove([asset_id,obj_id])        
+        st.session_state['plan'].remove_pair('time',asset_id,obj_id)
         st.session_state['plan'] = obj.project(st.session_state['plan'])
     
     # If it exists, emove liability, which in principle should remove everything else
@@ -1054,6 +1054,7 @@ def remove_child(child_name, session_state):
         # Remove this child's component from the expense
         if child.id in expense.child_components:
             del expense.child_components[child.id]
+            expense.mark_dirty('child_components')
             
             # If no more children, remove the expense entirely
             if len(expense.child_components) == 0:
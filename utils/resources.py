@@ -0,0 +1,46 @@
+##################
+# DATA RESOURCES #
+##################
+
+# Data files shipped with the app (tax values, ratio recommendations) are resolved
+# relative to the package root rather than the working directory, and are only read
+# and parsed the first time they are needed. Parsed results are shared, so callers
+# must not modify them in place.
+
+import os
+import json
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_RESOURCES = {}
+
+def resource_path(relative_path):
+    """Absolute path of a file given relative to the package root (e.g. 'data/fed_tax_values.json')."""
+    return(os.path.join(PACKAGE_ROOT,relative_path))
+
+def read_json(relative_path):
+    """Parse a JSON file given relative to the package root."""
+    with open(resource_path(relative_path), 'r') as j:
+        try:
+            return(json.loads(j.read()))
+        except json.decoder.JSONDecodeError as e:
+            print(f"Invalid JSON string: {e}")
+            raise
+
+def get_resource(name,loader):
+    """Cached result of loader() under name, calling it on first use only."""
+    if name not in _RESOURCES:
+        _RESOURCES[name] = loader()
+    return(_RESOURCES[name])
+
+def load_json(relative_path):
+    """Parsed JSON file given relative to the package root, read once."""
+    return(get_resource(relative_path,lambda: read_json(relative_path)))
+
+def loaded_resources():
+    """Names of the resources loaded so far."""
+    return(list(_RESOURCES.keys()))
+
+def clear_resources():
+    """Forget all loaded resources, so they are read again on next use."""
+    _RESOURCES.clear()
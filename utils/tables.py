@@ -0,0 +1,270 @@
+###################
+# TABLE FUNCTIONS #
+###################
+
+# Statements and analytical time series built from a plan's objects. These are part of
+# the core engine (balance_and_tax fills plan.analytical_timeseries from them), so this
+# module must not import plotly or utils.plotting; the figures in utils.plotting build on it.
+
+import pandas as pd
+
+def make_people_list(plan,people):
+    if people == 'Joint':
+        people = [person.id for person in plan.people if person.dependent == False]
+    else:
+        people = [people]
+    return(people)
+
+def to_dataframe(plan,people,category,incl_tax_keyword=False):
+    people = people + ['Joint'] #make_people_list(plan,people)
+   # print(people)
+    all_out = []
+    
+    if incl_tax_keyword == True:
+        tax_keyword = ['tax_keyword']
+    else:
+        tax_keyword = []
+    #print(people)
+    for item in [x for x in getattr(plan,category) if x.person in people]:
+        if item.person == 'Joint':
+            for person in [x for x in item.components.keys() if x in people]:
+                temp = pd.DataFrame(
+                        {key:item.__dict__[key] for key in ['id','category','subcategory','name']+tax_keyword}|{'person':person,'value':item.components[person]},index=item.cal_year
+                    ).reset_index(
+                        drop=False
+                    ).rename(
+                        columns={'index':'cal_year','person':'person_split'}
+                    )
+                temp['person'] = 'Joint'
+                all_out.append(temp)
+        else:
+            temp = pd.DataFrame(
+                {key:item.__dict__[key] for key in ['id','person','category','subcategory','name','value']+tax_keyword},index=item.cal_year
+                ).reset_index(
+                    drop=False
+                ).rename(
+                    columns={'index':'cal_year','person':'person_split'}
+                )
+            temp['person'] = temp['person_split']
+            all_out.append(temp)
+    if len(all_out) == 0:
+        df = pd.DataFrame({'cal_year':plan.cal_year,'id':'','person_split':'','category':'','subcategory':'','name':'','value':0,'person':''})
+    else:
+        df = pd.concat(all_out)
+    return(df)
+
+def generate_statement(plan,people,year,statement_type='cashflow'):
+    if statement_type == 'cashflow':
+        obj_type_list = ['Income','Expense']
+        obj_type_ext = ['income','expenses']
+    elif statement_type=='balance_sheet':
+        obj_type_list = ['Asset','Liability']
+        obj_type_ext = ['assets','liabilities']
+    people = make_people_list(plan, people) 
+    
+    A_df = to_dataframe(plan, people, obj_type_ext[0])    
+    if statement_type == 'cashflow':
+        A_df = A_df.loc[(A_df['subcategory']!='Employer Match')&(A_df['cal_year']==year)&(A_df['value']>0.0),:]
+    elif statement_type == 'balance_sheet':
+        A_df = A_df.loc[(A_df['cal_year']==year)&(A_df['value']>0.0),:]
+    A_df['obj_type'] = obj_type_list[0]
+    if len(people) > 1:
+        A_df['name'] += A_df['person'].apply(lambda x: '' if x == 'Joint' else ' ('+plan.get_object_from_id(x).name+')')
+    #
+    B_df = to_dataframe(plan, people, obj_type_ext[1])
+    B_df = B_df.loc[(B_df['cal_year']==year)&(B_df['value']>0.0),:]
+
+    if statement_type == 'cashflow':
+        B_df.sort_values(by="category", key=lambda column: column.map(lambda e: ['Tax','Necessary','Discretionary','Savings'].index(e)), inplace=True)
+    B_df['obj_type'] = obj_type_list[1]
+    #
+    df = pd.concat([A_df,B_df])
+    
+    #
+    if statement_type == 'cashflow':
+        sorter = list(A_df['category'].unique()) + ['Tax','Necessary','Discretionary','Savings']
+    elif statement_type == 'balance_sheet':
+        sorter = list(A_df['category'].unique()) + list(B_df['category'].unique())
+    #
+    df_cat = df.loc[:,['obj_type','category','value']].groupby(['obj_type','category']).sum().reset_index(drop=False)    
+    df_cat.sort_values(by="category", key=lambda column: column.map(lambda e: sorter.index(e)), inplace=True)
+    df_subcat = df.loc[:,['obj_type','category','subcategory','value']].groupby(['obj_type','category','subcategory']).sum().reset_index(drop=False).sort_values(by='value',ascending=False)
+    df_name = df.loc[:,['obj_type','category','subcategory','name','value']].groupby(['obj_type','category','subcategory','name']).sum().reset_index(drop=False).sort_values(by='value',ascending=False)
+    out_df = pd.DataFrame({'obj_type':pd.Series(dtype='object'),
+                           'category':pd.Series(dtype='object'),
+                           'subcategory':pd.Series(dtype='object'),
+                           'name':pd.Series(dtype='object'),
+                           'value':pd.Series(dtype='int')})
+
+    for obj_type in obj_type_list:
+        out_df = pd.concat([out_df,pd.DataFrame({'obj_type':[obj_type]})])
+        for cat in df_cat.loc[df_cat['obj_type']==obj_type,'category']:
+            cat_value = df_cat.loc[(df_cat['obj_type']==obj_type) & (df_cat['category']==cat),'value'].sum()
+            out_df = pd.concat([out_df,pd.DataFrame({'category':[cat],'value':[str(cat_value)]})])
+            for subcat in df_subcat.loc[(df_subcat['obj_type']==obj_type)&(df_subcat['category']==cat),'subcategory']:
+                out_df = pd.concat([out_df,pd.DataFrame({'subcategory':[subcat],'value':['']})]) #df_subcat.loc[df_subcat['subcategory']==subcat,'value']})])
+                for name in df_name.loc[(df_name['obj_type']==obj_type)&(df_name['category']==cat)&(df_name['subcategory']==subcat),'name']:
+                    name_value = df_name.loc[(df_name['obj_type']==obj_type) &
+                                             (df_name['category']==cat) &
+                                             (df_name['subcategory']==subcat) &
+                                             (df_name['name']==name),'value'].sum()
+                    out_df = pd.concat([out_df,pd.DataFrame({'name':[name],'value':[str(name_value)]})])
+    if statement_type == 'balance_sheet':
+        out_df = pd.concat([out_df,pd.DataFrame({'obj_type':['Net Worth'],'value':[str(A_df['value'].sum()-B_df['value'].sum())]})])
+    
+    out_df = out_df.fillna('').reset_index(drop=True)
+    return(out_df)
+
+##### ANALYTICAL TIME SERIES
+
+def compute_analytical_timeseries(plan,people):
+    people = make_people_list(plan,people)
+
+    asset_df = to_dataframe(plan,people,'assets')
+    liab_df = to_dataframe(plan,people,'liabilities')
+    inc_df = to_dataframe(plan, people, 'income')
+    exp_df = to_dataframe(plan, people, 'expenses')
+        
+    gross_income = inc_df.loc[inc_df['subcategory']!='Employer Match',['cal_year','value']].groupby('cal_year').sum(numeric_only=True)
+    income_tax = exp_df.loc[(exp_df['category']=='Tax')&(exp_df['subcategory']=='Income'),['cal_year','value']].groupby(['cal_year']).sum(numeric_only=True)
+    after_tax_income  = gross_income-income_tax
+    
+    ### Savings and Liquidity Metrics
+    
+    # 1. Liquidity Ratio = cash and cash investments / (non-discretionary expenses/12) (monthly)
+    # 3 to 6 (i.e. months of emergency fund)
+    
+    cash_assets = asset_df.loc[asset_df['subcategory'].isin(['Savings','Bonds']),['cal_year','value']].groupby(['cal_year']).sum(numeric_only=True)
+    non_discretionary_expenses = exp_df.loc[exp_df['category']=='Necessary',['cal_year','value']].groupby(['cal_year']).sum(numeric_only=True)
+    
+    liquidity_ratio = cash_assets/(non_discretionary_expenses/12)
+    
+    # 2. Savings Ratio =  cash savings / after-tax income
+    # Around 10% ? That seems crazy
+    
+    cash_savings = exp_df.loc[exp_df['subcategory']=='Savings',['cal_year','value']].groupby(['cal_year']).sum(numeric_only=True)
+    
+    after_tax_savings_ratio = cash_savings/after_tax_income
+    
+    # 3. Total Savings Ratio =  savings + employer match / gross income
+    # Depends on retirement needs
+    
+    retirement_savings = exp_df.loc[exp_df['subcategory']=='Retirement',['cal_year','value']].groupby(['cal_year']).sum(numeric_only=True)
+    total_savings = cash_savings + retirement_savings
+    
+    total_savings_ratio = total_savings/gross_income
+    
+    # 4. Current Ratio = cash assets / current liabilities
+    # Short term debt...I don't really plan to carry short-term debt at the moment
+    # Can approximate by total annual debt payments
+    # Want greater than one, for sure
+    
+    current_liabilities = exp_df.loc[exp_df['subcategory'].str.split(' ').apply(lambda x:'Loan' in x)|(exp_df['name']=='Mortgage'),['cal_year','value']].groupby(['cal_year']).sum(numeric_only=True)
+    
+    current_ratio = cash_assets/current_liabilities
+    
+    ### Debt Metrics
+    
+    # 1. Debt to Assets: total liabilities / total assets
+    # Decrease over time, between 0.3 and 0.6
+    
+    total_liabilities = liab_df.loc[:,['cal_year','value']].groupby(['cal_year']).sum(numeric_only=True)
+    total_assets = asset_df.loc[:,['cal_year','value']].groupby(['cal_year']).sum(numeric_only=True)
+    
+    debt_to_asset_ratio = total_liabilities/total_assets
+    
+    # 2. Debt-to-Income Ratio: total debt payments (or current liabilities?) / gross income
+    # Keep below 35%
+    
+    debt_to_income_ratio = current_liabilities/gross_income
+    
+    # 3. Non-Mortgage-Debt-Service Ratio: (total debt payments - mortgage payment) / gross income
+    # Keep below 15%
+    
+    non_mortgage_debt_service_ratio = (current_liabilities - exp_df.loc[exp_df['name']=='Mortgage',['cal_year','value']].groupby(['cal_year']).sum(numeric_only=True))/gross_income
+    
+    # 4. Household-Debt-Service Ratio: (total debt payments-mortgage payment)/ after-tax income
+    # Keep below 25%
+    
+    household_debt_service_ratio = (current_liabilities - exp_df.loc[exp_df['name']=='Mortgage',['cal_year','value']].groupby(['cal_year']).sum(numeric_only=True))/after_tax_income
+    
+    # 5. Cost of Debt: Sum_i (balance_i*rate_i) / total debt
+    # Below average rate of return on investments..
+    
+    #This will require a little more work, since I need rates...will have to pull from liab_objects
+    
+    ### Net Worth, Investments, and Solvency Metrics
+    
+    net_worth = total_assets - total_liabilities #pd.concat([asset_df,liab_df.apply()]).loc[:,['cal_year','value']].groupby(['cal_year']).sum(numeric_only=True)
+    
+    # Plotted Above
+    # # 1. Target Net Worth = Age * gross income / 10
+    # # Compare to Net Worth
+    
+    # ages = pd.Series([age+i for i in range(len(years))])
+    # target_net_worth = age * gross_income / 10
+    
+    # # 2. Fire Number = 25 * annual expenses
+    # # Compare to Retirement Savings
+    
+    # fire_number = 25*exp_df.loc[exp_df['category'].isin(['Discretionary','Necessary'])].groupby(['cal_year']).sum(numeric_only=True)
+    
+    # 3. Liquid Savings to Net Worth = cash savings / net worth
+    # Shoot for 15% ?
+    
+    liquid_savings_to_net_worth_ratio = cash_assets/net_worth
+    
+    # 4. Invested Assets to Net Worth = invested assets / net worth
+    # Trend higher over time...? 50% or more
+    
+    invested_assets = asset_df.loc[asset_df['category']=='Investment',['cal_year','value']].groupby('cal_year').sum(numeric_only=True)
+    
+    invested_assets_to_net_worth_ratio = invested_assets/net_worth
+    
+    # 5. Solvency Ratio: net worth / total assets
+    # 0.2 when young, approach 0.9 in retirement
+    
+    solvency_ratio = net_worth/total_assets
+    
+    # 6. Basic Housing Ratio: housing costs / gross income
+    # Less than 0.28, or 0.33 in HCOL
+    
+    housing_costs = exp_df.loc[(exp_df['subcategory'].isin(['Home','Utilities']))|(exp_df['name']=='Property Tax'),['cal_year','value']].groupby('cal_year').sum(numeric_only=True)
+    
+    basic_housing_ratio = housing_costs/gross_income
+    
+    # 7. Investment Assets to Gross Pay: invested assets + cash / gross income
+    # Goal: 20:1 by retirement
+    
+    investment_assets_to_gross_pay_ratio = (invested_assets + cash_assets)/gross_income
+    
+    output_dict = {'gross_income':gross_income,
+        'after_tax_income':after_tax_income,
+        'cash_assets':cash_assets,
+        'non_discretionary_expenses':non_discretionary_expenses,
+        'liquidity_ratio':liquidity_ratio,
+        'cash_savings':cash_savings,
+        'after_tax_savings_ratio':after_tax_savings_ratio,
+        'retirement_savings':retirement_savings,
+        'total_savings':total_savings,
+        'total_savings_ratio':total_savings_ratio,
+        'current_liabilities':current_liabilities,
+        'current_ratio':current_ratio,
+        'total_liabilities':total_liabilities,
+        'total_assets':total_assets,
+        'debt_to_asset_ratio':debt_to_asset_ratio,
+        'debt_to_income_ratio':debt_to_income_ratio,
+        'non_mortgage_debt_service_ratio':non_mortgage_debt_service_ratio,
+        'household_debt_service_ratio':household_debt_service_ratio,
+        'net_worth':net_worth,
+        'liquid_savings_to_net_worth_ratio':liquid_savings_to_net_worth_ratio,
+        'invested_assets':invested_assets,
+        'invested_assets_to_net_worth_ratio':invested_assets_to_net_worth_ratio,
+        'solvency_ratio':solvency_ratio,
+        'housing_costs':housing_costs,
+        'basic_housing_ratio':basic_housing_ratio,
+        'investment_assets_to_gross_pay_ratio':investment_assets_to_gross_pay_ratio}
+    
+    output_df = pd.DataFrame({key:value.squeeze() for key, value in output_dict.items()})
+
+    return(output_df)
@@ -1,32 +1,21 @@
 import pandas as pd
 import numpy as np
-import json
+import concurrent.futures
 from copy import deepcopy
 
 import utils.utilities
+import utils.resources
 import objs.financial_objects
-import utils.plotting
+import utils.tables
 
 #### SUMMING A LIST OF PANDAS SERIES????
 
 # LOAD TAX PARAMETERS
+# | Tax values are read through utils.resources on first use (paths are relative to the package root)
 
 fed_file_path = 'data/fed_tax_values.json'
-
-with open(fed_file_path, 'r') as j:
-    try:
-        fed = json.loads(j.read())
-    except json.decoder.JSONDecodeError as e:
-        print(f"Invalid JSON string: {e}")
-
 state_file_path = 'data/state_tax_values.json'
 
-with open(state_file_path, 'r') as j:
-    try:
-        state = json.loads(j.read())['California']
-    except json.decoder.JSONDecodeError as e:
-        print(f"Invalid JSON string: {e}")
-
 noninflationary = ['age','rate','rates','multiplier','multipliers']
 
 # Convert string 'np.inf' to numpy infinity object
@@ -43,8 +32,49 @@ def replace_npinf(obj):
         obj = [replace_npinf(item) for item in obj]
     return(obj)
             
-fed = replace_npinf(fed)
-state = replace_npinf(state)
+def fed_tax_values():
+    """Federal tax values, loaded on first use with their 'np.inf' strings resolved."""
+    return(utils.resources.get_resource('fed_tax_values',lambda: replace_npinf(deepcopy(utils.resources.load_json(fed_file_path)))))
+
+# Tax Jurisdictions
+# | State tax values are keyed by jurisdiction (state name). Each one is read from
+# | state_file_path on first use, or added with register_jurisdiction, and kept with its
+# | 'np.inf' strings resolved; compiled tables are built per jurisdiction by get_tax_tables.
+# | Plans use plan.tax_jurisdiction, and a person's tax_jurisdiction (if set) overrides it
+# | for the scenarios they file alone.
+
+DEFAULT_JURISDICTION = 'California'
+_JURISDICTIONS = {}
+
+def _state_file_values():
+    """Raw state tax values from state_file_path, parsed once."""
+    return(utils.resources.load_json(state_file_path))
+
+def register_jurisdiction(name,tax_values):
+    """Add (or replace) a jurisdiction's state tax values, laid out like state_tax_values.json entries."""
+    _JURISDICTIONS[name] = replace_npinf(deepcopy(tax_values))
+
+def available_jurisdictions():
+    """Names of the jurisdictions in state_tax_values.json and those registered."""
+    return(sorted(set(_state_file_values().keys()) | set(_JURISDICTIONS.keys())))
+
+def state_tax_values(jurisdiction=None):
+    """State tax values for a jurisdiction (DEFAULT_JURISDICTION if None), loaded on first use."""
+    name = DEFAULT_JURISDICTION if jurisdiction is None else jurisdiction
+    if name not in _JURISDICTIONS:
+        values = _state_file_values()
+        if name not in values:
+            raise ValueError(f"No state tax values for jurisdiction '{name}'")
+        register_jurisdiction(name,values[name])
+    return(_JURISDICTIONS[name])
+
+def filer_jurisdiction(plan,filers):
+    """Jurisdiction for a set of filers: their own if they all agree on one, otherwise the plan's."""
+    people = [plan.get_object_from_id(filer) for filer in filers if filer != 'Joint']
+    jurisdictions = set([person.tax_jurisdiction or plan.tax_jurisdiction for person in people if person is not None])
+    if len(jurisdictions) == 1:
+        return(jurisdictions.pop())
+    return(plan.tax_jurisdiction)
         
 
 #################
@@ -68,18 +98,225 @@ def apply_tax(income,tax_brackets,tax_rate):
 
 # apply apply_tax
 
-def apply_tax_series(income_series,tax_bracket_series,tax_rate_series):
-  """Apply tax calculation to time series of income."""
-  return(pd.Series([apply_tax(income_series[year],tax_bracket_series[year],tax_rate_series[year]) for year in income_series.index],index=income_series.index))
+def bracket_matrices(tax_bracket_series,tax_rate_series,years):
+  """Stack the bracket and rate lists for each year into (years x brackets) arrays, padding with inf."""
+  brackets = tax_bracket_series.tolist() if tax_bracket_series.index.equals(years) else [tax_bracket_series[year] for year in years]
+  rates = tax_rate_series.tolist() if tax_rate_series.index.equals(years) else [tax_rate_series[year] for year in years]
+  if len(set(map(len,brackets+rates))) == 1:
+    return([np.array(brackets,dtype=float),np.array(rates,dtype=float)])
+  width = max([len(row) for row in brackets+rates],default=0)
+  bracket_matrix = np.full((len(brackets),width),np.inf)
+  rate_matrix = np.full((len(rates),width),np.nan)
+  for row, (bracket_row, rate_row) in enumerate(zip(brackets,rates)):
+    bracket_matrix[row,:len(bracket_row)] = bracket_row
+    rate_matrix[row,:len(rate_row)] = rate_row
+  return([bracket_matrix,rate_matrix])
+
+def apply_tax_brackets(income,bracket_matrix,rate_matrix,return_rates=False):
+  """
+  Vectorized apply_tax: progressive tax for an income vector against (years x brackets) matrices.
+
+  Gives the same result as apply_tax for every year (including zero tax at or below the
+  first bracket and for NaN income), with the bracket amounts summed in the same order.
+  With return_rates, also returns the marginal and effective rate vectors.
+  """
+  income = np.asarray(income,dtype=float)
+  rows = np.arange(len(income))
+  # First bracket at or above the income: apply_tax's stopping index
+  stop = np.argmax(bracket_matrix >= income[:,None],axis=1)
+  below = np.maximum(stop-1,0)
+  with np.errstate(invalid='ignore'):
+    widths = np.diff(bracket_matrix,axis=1,prepend=0)
+    filled = np.cumsum(widths*rate_matrix,axis=1)[rows,below]
+    top = (income-bracket_matrix[rows,below])*rate_matrix[rows,stop]
+  top = np.where(top > 0,top,0.0)
+  tax = np.where(stop > 0,filled+top,0.0)
+  if (stop == 0).all():
+    tax = tax.astype(int)
+  if return_rates:
+    marginal = np.where(stop > 0,rate_matrix[rows,stop],0.0)
+    with np.errstate(divide='ignore',invalid='ignore'):
+      effective = np.where(income > 0,tax/income,0.0)
+    return([tax,marginal,effective])
+  return(tax)
+
+def apply_tax_series(income_series,tax_bracket_series,tax_rate_series,return_rates=False):
+  """Apply tax calculation to time series of income (optionally with marginal and effective rates)."""
+  bracket_matrix, rate_matrix = bracket_matrices(tax_bracket_series,tax_rate_series,income_series.index)
+  out = apply_tax_brackets(income_series.to_numpy(),bracket_matrix,rate_matrix,return_rates)
+  if return_rates:
+    return([pd.Series(values,index=income_series.index) for values in out])
+  return(pd.Series(out,index=income_series.index))
+
+# Array helpers for calculate_filer_tax
+
+def clamp_at_zero(series):
+  """series.apply(lambda x: max(x,0)) as an array operation, with the same result dtype."""
+  values = series.to_numpy()
+  clamped = 0 > values
+  out = np.where(clamped,0,values)
+  if len(out) > 0 and clamped.all():
+    # apply infers integers when every element came back as the int 0
+    out = out.astype(int)
+  return(pd.Series(out,index=series.index,name=series.name))
+
+def choose_deduction(standard,itemized):
+  """
+  Larger of the standard and itemized deduction in each year (standard on ties), as a
+  DataFrame of 'amt' and 'name' indexed by year, as the old groupby/idxmax/merge produced.
+  """
+  if not (standard.index.equals(itemized.index) and standard.index.is_unique and standard.index.is_monotonic_increasing):
+    standard = pd.concat([standard,pd.Series(['Standard' for _ in standard.index],index=standard.index)],axis=1).rename(columns={0:'amt',1:'name'})
+    itemized = pd.concat([itemized,pd.Series(['Itemized' for _ in itemized.index],index=itemized.index)],axis=1).rename(columns={0:'amt',1:'name'})
+    all_deductions = pd.concat([standard,itemized]).reset_index(drop=False)
+    return(all_deductions.groupby("index").agg({'amt':['idxmax','max']}).droplevel(0,axis=1).merge(all_deductions[['index','name']],left_on='idxmax',right_index=True).drop(['idxmax','index'],axis=1).rename(columns={'max':'amt'}))
+  standard_amt = standard.to_numpy()
+  itemized_amt = itemized.to_numpy()
+  take_itemized = (itemized_amt > standard_amt) | (pd.isna(standard_amt) & pd.notna(itemized_amt))
+  return(pd.DataFrame({'amt':np.where(take_itemized,itemized_amt,standard_amt),
+                       'name':np.where(take_itemized,'Itemized','Standard')},
+                      index=pd.Index(standard.index,name='index')))
+
+def child_tax_credit(income,credit_max,limit,phaseout_rate):
+  """
+  Child tax credit after the phase-out, as the old row-wise apply computed it:
+  the full credit up to the limit, reduced by phaseout_rate above it, and 0 once fully phased out.
+  """
+  child_credit = pd.DataFrame({'I':income,'M':credit_max,'L':limit,'R':phaseout_rate})
+  I, M, L, R = [child_credit[col].to_numpy(dtype=float) for col in ['I','M','L','R']]
+  with np.errstate(divide='ignore',invalid='ignore'):
+    phasing_out = (L < I) & (I <= L + (1/R)*M)
+    credit = np.where(I <= L,M,np.where(phasing_out,M - R*(I-L),0.0))
+  if len(credit) > 0 and not ((I <= L) | phasing_out).any():
+    credit = credit.astype(int)
+  return(pd.Series(credit,index=child_credit.index))
+
+def dependent_care_terms(tax_tables,level,tax_filing,adjusted_gross_income,qualifying_dependents,cal_year):
+  """Child and dependent care credit multiplier (by AGI bracket) and cap (by number of dependents) for each year."""
+  tax_vals = tax_tables.fed if level == 'fed' else tax_tables.state
+  credits = tax_vals['credits']
+  limits = tax_tables.list_matrix(level,'credits','child_dep_care_limits',tax_filing)
+  multipliers = tax_tables.list_matrix(level,'credits','child_dep_care_multipliers',tax_filing)
+  maxes = tax_tables.list_matrix(level,'credits','child_dep_care_max',tax_filing)
+  if limits is None or multipliers is None or maxes is None or maxes.shape[1] < 2 or not adjusted_gross_income.index.equals(tax_tables.years):
+    eff_multi = pd.Series([credits['child_dep_care_multipliers'][tax_filing][i][list(lim >= adjusted_gross_income[i] for lim in credits['child_dep_care_limits'][tax_filing][i]).index(True)] for i in cal_year],index=cal_year)
+    eff_max = pd.Series([credits['child_dep_care_max'][tax_filing][i][0] if qualifying_dependents[i] == 1 else 0 if qualifying_dependents[i] == 0 else credits['child_dep_care_max'][tax_filing][i][1] for i in cal_year],index=cal_year)
+    return([eff_multi,eff_max])
+  rows = np.arange(len(cal_year))
+  # First limit at or above AGI picks the multiplier
+  within = limits.astype(float) >= adjusted_gross_income.to_numpy(dtype=float)[:,None]
+  if not within.any(axis=1).all():
+    raise ValueError('Income above every child and dependent care limit')
+  eff_multi = multipliers[rows,np.argmax(within,axis=1)]
+  dependents = qualifying_dependents.to_numpy()
+  eff_max = np.where(dependents == 1,maxes[:,0],np.where(dependents == 0,0,maxes[:,1]))
+  # Element lists keep the per-year values' own types, so the Series infer the same dtype as before
+  return([pd.Series(eff_multi.tolist(),index=cal_year),pd.Series(eff_max.tolist(),index=cal_year)])
 
 # calculate_income_and_payroll_tax
 
-def calculate_income_and_payroll_tax(plan):
+def inflate_tax_values(plan,jurisdiction=None):
+  """Federal and state tax values, expanded to every filing status and inflated over plan.cal_year."""
+  # For ease of navigating the dict, we will recalculate from in the input year for each
+  # Year in the projection. There is probably a faster way to do this by not looping over time, but
+  # that is a task for another day...
+  
+  fed_infl = deepcopy(fed_tax_values())
+  state_infl = deepcopy(state_tax_values(jurisdiction))
+  for tax_vals in [fed_infl,state_infl]:
+      for level in ["tax","deductions","credits"]:
+          for name in tax_vals[level]:
+              if isinstance(tax_vals[level][name],dict) == False:
+                  tax_vals[level][name] = {filing_status:tax_vals[level][name] for filing_status in ["single","joint","separate"]}
+              if "separate" not in tax_vals[level][name]:
+                  tax_vals[level][name]["separate"] = tax_vals[level][name]["single"]
+              if name.split('_')[-1] in noninflationary:
+                  tax_vals[level][name] = {filing_status:pd.Series([tax_vals[level][name][filing_status] for _ in plan.cal_year],index=plan.cal_year) for filing_status in tax_vals[level][name]}
+              else:
+                  tax_vals[level][name] = {filing_status:utils.utilities.inflate_amount(tax_vals[level][name][filing_status],utils.utilities.expand_contract(plan.infl_rate,plan.cal_year)) for filing_status in tax_vals[level][name]}
+  return([fed_infl,state_infl])
+
+class TaxTables:
+  """
+  Federal and one jurisdiction's state tax values inflated over a calendar, with the income
+  tax brackets compiled into (years x brackets) matrices for every filing status.
+  
+  Tables are shared through get_tax_tables, so their Series must not be modified in place.
+  """
+  def __init__(self,plan,jurisdiction=None):
+    self.years = pd.Index(plan.cal_year)
+    self.jurisdiction = DEFAULT_JURISDICTION if jurisdiction is None else jurisdiction
+    self.fed, self.state = inflate_tax_values(plan,self.jurisdiction)
+    self.brackets = {level:{filing_status:bracket_matrices(tax_vals['tax']['brackets'][filing_status],tax_vals['tax']['rates'][filing_status],self.years)
+                            for filing_status in tax_vals['tax']['brackets']}
+                     for level, tax_vals in [['fed',self.fed],['state',self.state]]}
+    self.matrices = {}
+
+  def apply_tax(self,level,tax_filing,income_series):
+    """Income tax on a year-indexed income series, from the compiled brackets ('fed' or 'state')."""
+    if not income_series.index.equals(self.years):
+      tax_vals = self.fed if level == 'fed' else self.state
+      return(apply_tax_series(income_series,tax_vals['tax']['brackets'][tax_filing],tax_vals['tax']['rates'][tax_filing]))
+    bracket_matrix, rate_matrix = self.brackets[level][tax_filing]
+    return(pd.Series(apply_tax_brackets(income_series.to_numpy(),bracket_matrix,rate_matrix),index=income_series.index))
+
+  def list_matrix(self,level,section,name,tax_filing):
+    """
+    Per-year list values (e.g. credit limits) stacked into a (years x items) object array, built
+    on first use; None if the lists are ragged.
+    """
+    key = (level,section,name,tax_filing)
+    if key not in self.matrices:
+      tax_vals = self.fed if level == 'fed' else self.state
+      rows = tax_vals[section][name][tax_filing].tolist()
+      matrix = None
+      if len(rows) > 0 and len(set(map(len,rows))) == 1:
+        matrix = np.empty((len(rows),len(rows[0])),dtype=object)
+        matrix[:] = rows
+      self.matrices[key] = matrix
+    return(self.matrices[key])
+
+# Compiled tables by (jurisdiction, tax data version, calendar and inflation), shared across runs and plans
+_TAX_TABLES_CACHE = {}
+_TAX_TABLES_CACHE_SIZE = 8
+
+def tax_data_version(jurisdiction=None):
+  """Fingerprint of the raw federal and the jurisdiction's state tax values."""
+  return(utils.utilities.fingerprint(fed_tax_values(),state_tax_values(jurisdiction)))
+
+def get_tax_tables(plan,jurisdiction=None):
+  """Compiled TaxTables for a jurisdiction and the plan's calendar and inflation, built once per distinct input."""
+  jurisdiction = plan.tax_jurisdiction if jurisdiction is None else jurisdiction
+  key = (jurisdiction,tax_data_version(jurisdiction),utils.utilities.fingerprint(plan.cal_year,plan.infl_rate))
+  if key not in _TAX_TABLES_CACHE:
+    if len(_TAX_TABLES_CACHE) >= _TAX_TABLES_CACHE_SIZE:
+      _TAX_TABLES_CACHE.pop(next(iter(_TAX_TABLES_CACHE)))
+    _TAX_TABLES_CACHE[key] = TaxTables(plan,jurisdiction)
+  return(_TAX_TABLES_CACHE[key])
+
+def tax_inputs_fingerprint(plan,filers,all_payroll_tax_names):
+  """Fingerprint of everything calculate_filer_tax reads for a set of filers."""
+  income = [obj for obj in plan.income if obj.person in filers]
+  # Mortgage and property tax deductions use the plan's first such expense, whoever holds it
+  expenses = [obj for obj in plan.expenses if obj.tax_keyword not in ['',None] and ((obj.person in filers) or (obj.tax_keyword in ['Mortgage','Property Tax']))]
+  people = [[person.id,person.dependent,person.age] for person in plan.people]
+  jurisdiction = filer_jurisdiction(plan,filers)
+  return(utils.utilities.fingerprint(plan.cal_year,plan.infl_rate,plan.dependents,people,all_payroll_tax_names,income,expenses,jurisdiction,tax_data_version(jurisdiction)))
+
+# Filing scenarios (and the filers within them) are independent; above 1, filers that
+# need recomputing are evaluated on a thread pool of this size
+TAX_WORKERS = 1
+
+def calculate_income_and_payroll_tax(plan,incremental=False,workers=None):
   """
   Calculate income and payroll taxes for all filing scenarios.
   
   Args:
       plan: The plan object containing income and people
+      incremental: If True, reuse a filer's previous result when its inputs
+                   (tax_inputs_fingerprint) have not changed
+      workers: Thread pool size for evaluating filers concurrently (default TAX_WORKERS);
+               results are assembled in the serial order, so output is identical
       
   Returns:
       Dictionary of tax calculations for different filing statuses
@@ -102,267 +339,288 @@ def calculate_income_and_payroll_tax(plan):
           all_payroll_tax_names.append(tax_name)
   all_payroll_tax_names = sorted(list(set(all_payroll_tax_names)))
   
-  # For ease of navigating the dict, we will recalculate from in the input year for each
-  # Year in the projection. There is probably a faster way to do this by not looping over time, but
-  # that is a task for another day...
-  
-  fed_infl = deepcopy(fed)
-  state_infl = deepcopy(state)
-  for tax_vals in [fed_infl,state_infl]:
-      for level in ["tax","deductions","credits"]:
-          for name in tax_vals[level]:
-              if isinstance(tax_vals[level][name],dict) == False:
-                  tax_vals[level][name] = {filing_status:tax_vals[level][name] for filing_status in ["single","joint","separate"]}
-              if "separate" not in tax_vals[level][name]:
-                  tax_vals[level][name]["separate"] = tax_vals[level][name]["single"]
-              if name.split('_')[-1] in noninflationary:
-                  tax_vals[level][name] = {filing_status:pd.Series([tax_vals[level][name][filing_status] for _ in plan.cal_year],index=plan.cal_year) for filing_status in tax_vals[level][name]}
-              else:
-                  tax_vals[level][name] = {filing_status:utils.utilities.inflate_amount(tax_vals[level][name][filing_status],utils.utilities.expand_contract(plan.infl_rate,plan.cal_year)) for filing_status in tax_vals[level][name]}
-                  
+  # Every (filing status, filers) scenario in serial order, with its cached result if reusable
+  # Single and separate scenarios share their filers, so their inputs are fingerprinted once
+  scenarios = []
+  filer_inputs = {}
   for tax_filing in filing_status_list:
     if tax_filing == 'joint': 
-      joint_exp_multi = 1
       filer_list = [people + ['Joint']] 
     elif tax_filing == 'separate' or tax_filing == 'single': 
-      joint_exp_multi = 0.5
       filer_list = [[name,'Joint'] for name in people]
   
     for filers in filer_list:
-      # Gross Taxable Income
-      gross_taxable_income = sum([obj.value for obj in plan.income if ((obj.taxable==True) and (obj.person in filers))])
-      if isinstance(gross_taxable_income,(float,int)):
-          if gross_taxable_income == 0:
-              gross_taxable_income = pd.Series(0,index=plan.cal_year)
-      # ABOVE - THE - LINE DEDUCTIONS
-      # Retirment / HSA Accounts:
-      # Cannot be jointly held, and thus have individual limits (which have already been enforced)    
-       
-      pretax_deductions = sum([obj.value for obj in plan.get_tax_keyword_objects(['Traditional','HSA']) if (obj.person in filers)])
-  
-      # Modifed Adjusted Gross Income (MAGI)
-      modified_adjusted_gross_income = gross_taxable_income - pretax_deductions
-  
-      # Student Loan Interest Deduction
-      # Phases out at higher incomes...haven't bothered with this yet
-      
-      student_loan_interest = sum([obj.interest_payment_annual for obj in plan.get_tax_keyword_objects("Student Loan") if (obj.person in filers)])
-      if isinstance(student_loan_interest,int):
-          if student_loan_interest == 0:
-              student_loan_interest = pd.Series([0 for _ in range(len(plan.cal_year))],index=plan.cal_year)
-          else:
-              print('Error - Summing Student Loan Interest')
+      key = (tax_filing,tuple(filers))
+      if tuple(filers) not in filer_inputs:
+        filer_inputs[tuple(filers)] = tax_inputs_fingerprint(plan,filers,all_payroll_tax_names)
+      inputs = filer_inputs[tuple(filers)]
+      if incremental and key in plan._tax_cache and plan._tax_cache[key][0] == inputs:
+        scenarios.append([tax_filing,filers,key,inputs,plan._tax_cache[key][1]])
       else:
-         student_loan_interest = pd.concat([student_loan_interest,fed_infl['deductions']['student_loan_max'][tax_filing]], axis=1).min(axis=1) 
-         student_loan_interest[fed_infl['deductions']['student_loan_magi_thresh'] <= modified_adjusted_gross_income] = 0
-  
-      # Adjusted Gross Income (AGI)
-      adjusted_gross_income = modified_adjusted_gross_income-student_loan_interest
-      
-      ### BELOW - THE - LINE DEDUCTIONS
-      # One difficulty with this is the SALT itemized deduction requires requires the computation of 
-      # state taxes before it can be determined whether or not to itemize for federal...can this be correct?
-      
-      #Itemized Deductions (common)
-      fed_itemized_deductions = []
-      state_itemized_deductions = []
-  
-      # Mortgage interest on up to two homes, and points
-      # Will need to look at this for multiple houses, when figuring deductible interest is much trickier
-      if len([obj for obj in plan.get_tax_keyword_objects('Mortgage') if obj.person in filers]) > 0:
-        mortgage_rate = plan.get_tax_keyword_objects('Mortgage')[0].interest_rate
-        mortgage_interest = sum([obj.interest_payment_annual*joint_exp_multi if obj.person=='Joint' else obj.interest_payment_annual for obj in plan.get_tax_keyword_objects('Mortgage')]) #trivial sum
-        #
-        fed_itemized_deductions.append(pd.concat([mortgage_interest,fed_infl['deductions']['mortgage_limit'][tax_filing]*mortgage_rate], axis=1).min(axis=1))
-        state_itemized_deductions.append(pd.concat([mortgage_interest,state_infl['deductions']['mortgage_limit'][tax_filing]*mortgage_rate], axis=1).min(axis=1))
-      
-      # Property taxes inf state limit, 10k federal limit (combined with state taxes)
-      if len([obj for obj in plan.get_tax_keyword_objects('Property Tax') if obj.person in filers]) > 0:
-        property_tax = plan.get_tax_keyword_objects('Property Tax')[0].value
-        if plan.get_tax_keyword_objects('Property Tax')[0].person=='Joint':
-            property_tax = property_tax*joint_exp_multi
-        state_itemized_deductions.append(pd.concat([property_tax,state_infl['deductions']['property_tax_max'][tax_filing]], axis=1).min(axis=1))
-      else:
-        property_tax = pd.Series([0 for _ in plan.cal_year],index=plan.cal_year) #Makes calculating SALT easier
-  
-      # Medical and dental expenses that exceed 7.5% of your adjusted gross income,
-      if len([obj for obj in plan.get_tax_keyword_objects('Medical') if obj.person in filers]) > 0:
-        medical_expenses = [obj for obj in plan.get_tax_keyword_objects("Medical") if obj.person in filers]
-        medical_expenses = sum([obj.value*joint_exp_multi if obj.person=='Joint' else obj.value for obj in medical_expenses])
-        #
-        fed_itemized_deductions.append(pd.concat([medical_expenses,adjusted_gross_income*fed_infl['deductions']['medical_limit_rate']], axis=1).min(axis=1))
-        state_itemized_deductions.append(pd.concat([medical_expenses,adjusted_gross_income*state_infl['deductions']['medical_limit_rate']], axis=1).min(axis=1))
-  
-      # Charitable donations 
-      if len([obj for obj in plan.get_tax_keyword_objects('Charitable Donations') if obj.person in filers]) > 0:
-        charitable_donations = [obj for obj in plan.get_tax_keyword_objects("Charitable Donations") if obj.person in filers]
-        charitable_donations = sum([obj.value*joint_exp_multi if obj.person=='Joint' else obj.value for obj in charitable_donations])
-        #
-        fed_itemized_deductions.append(pd.concat([charitable_donations,adjusted_gross_income*fed_infl['deductions']['charity_limit_rate']], axis=1).min(axis=1))
-        state_itemized_deductions.append(pd.concat([charitable_donations,adjusted_gross_income*state_infl['deductions']['charity_limit_rate']], axis=1).min(axis=1))
-  
-      # State and Local income or sales Taxes (SALT - Federal Only)
-      # Since state income tax may be deductible, we compute it here...which is annoying
-      # I could alternatively use withholding, but it's not an easy formula
-      
-      if len(state_itemized_deductions)==0:
-        state_itemized_deductions = pd.Series([0 for _ in plan.cal_year],index=plan.cal_year)
-      elif len(state_itemized_deductions) > 0:
-        state_itemized_deductions = sum(state_itemized_deductions)
-      state_itemized_deductions = pd.concat([state_itemized_deductions,pd.Series(['Itemized' for _ in plan.cal_year],index=plan.cal_year)],axis=1).rename(columns={0:'amt',1:'name'})
-      state_standard_deduction = pd.concat([state_infl['deductions']['standard_deduction'][tax_filing],pd.Series(['Standard' for _ in plan.cal_year],index=plan.cal_year)],axis=1).rename(columns={0:'amt',1:'name'})  
-      all_state_deductions = pd.concat([state_standard_deduction,state_itemized_deductions]).reset_index(drop=False)
-      state_deduction = all_state_deductions.groupby("index").agg({'amt':['idxmax','max']}).droplevel(0,axis=1).merge(all_state_deductions[['index','name']],left_on='idxmax',right_index=True).drop(['idxmax','index'],axis=1).rename(columns={'max':'amt'})
-      state_taxable_income = adjusted_gross_income-state_deduction["amt"]
-      state_taxable_income = state_taxable_income.apply(lambda x: max(x,0))
-      state_income_tax = apply_tax_series(state_taxable_income,state_infl['tax']['brackets'][tax_filing],state_infl['tax']['rates'][tax_filing])
-      
-      
-      # Apply Any Tax Credits... Childcare Tax Credit is the only CA one I see as relevant right now
-      state_tax_credits = []
-      fed_tax_credits = []
-  
-      # Child and Dependent Care Credit 
-      if (tax_filing != 'separate') & len([obj for obj in plan.get_tax_keyword_objects('Child or Dependent Care') if obj.person in filers]) > 0:
-        child_dependent_care_expenses = [obj for obj in plan.get_tax_keyword_objects('Child or Dependent Care') if obj.person in filers]
-        child_dependent_care_expenses = sum([obj.value*joint_exp_multi if obj.person=='Joint' else obj.value for obj in child_dependent_care_expenses])
-        qualifying_dependents = [[1 if ((age < 13) and (age >= 0)) else 0 for age in person.age] for person in plan.people if person.dependent == True]
-        qualifying_dependents = pd.Series([sum(x) for x in zip(*qualifying_dependents)],index=plan.cal_year)
-
-        fed_child_dependent_care_eff_multi = pd.Series([fed_infl['credits']['child_dep_care_multipliers'][tax_filing][i][list(lim >= adjusted_gross_income[i] for lim in fed_infl['credits']['child_dep_care_limits'][tax_filing][i]).index(True)] for i in plan.cal_year],index=plan.cal_year)
-        fed_child_dependent_care_amt = fed_child_dependent_care_eff_multi*child_dependent_care_expenses
-        fed_child_dependent_care_eff_max = pd.Series([fed_infl['credits']['child_dep_care_max'][tax_filing][i][0] if qualifying_dependents[i] == 1 else 0 if qualifying_dependents[i] == 0 else fed_infl['credits']['child_dep_care_max'][tax_filing][i][1] for i in plan.cal_year],index=plan.cal_year)
-        fed_child_dependent_care_credit = pd.concat([fed_child_dependent_care_amt,fed_child_dependent_care_eff_max], axis=1).min(axis=1) 
-        fed_tax_credits.append(fed_child_dependent_care_credit)
-        
-        # State credit currently based off federal for parsimony...
-        state_child_dependent_care_eff_multi = pd.Series([state_infl['credits']['child_dep_care_multipliers'][tax_filing][i][list(lim >= adjusted_gross_income[i] for lim in state_infl['credits']['child_dep_care_limits'][tax_filing][i]).index(True)] for i in plan.cal_year],index=plan.cal_year)
-        state_child_dependent_care_amt = state_child_dependent_care_eff_multi*child_dependent_care_expenses
-        state_child_dependent_care_eff_max = pd.Series([state_infl['credits']['child_dep_care_max'][tax_filing][i][0] if qualifying_dependents[i] == 1 else 0 if qualifying_dependents[i] == 0 else state_infl['credits']['child_dep_care_max'][tax_filing][i][1] for i in plan.cal_year],index=plan.cal_year)
-        state_child_dependent_care_credit = pd.concat([state_child_dependent_care_amt,state_child_dependent_care_eff_max], axis=1).min(axis=1) 
-        state_tax_credits.append(state_child_dependent_care_credit)
-     
-      # CA Exemption:
-      state_tax_credits.append(state_infl['credits']['exemption'][tax_filing])    
-       
-      # CA has a child tax credit, but must qualify for earned income tax credit
-      # Total state credits and compute tax 
-      if len(state_tax_credits)==0:
-          state_tax_credits.append(pd.Series([0 for _ in plan.cal_year],index=plan.cal_year))
-      
-      state_tax_credits = sum(state_tax_credits)
-      state_income_tax = state_income_tax - state_tax_credits
-      # Currently no excess credit is returned:
-      state_income_tax = state_income_tax.apply(lambda x: max(x,0))
-      
-      # Back to Federal...
-      # SALT (State and Local Tax) Deduction
-      SALT = pd.concat([fed_infl['deductions']['SALT_max'][tax_filing],(state_income_tax+property_tax)], axis=1).min(axis=1) 
-      fed_itemized_deductions.append(SALT)
+        scenarios.append([tax_filing,filers,key,inputs,None])
   
-      # Compute federal deduction:
-
-      if len(fed_itemized_deductions)==0:
-        fed_itemized_deductions = pd.Series([0 for _ in plan.cal_year],index=plan.cal_year)
-      elif len(fed_itemized_deductions) > 0:
-        fed_itemized_deductions = sum(fed_itemized_deductions)
-      fed_itemized_deductions = pd.concat([fed_itemized_deductions,pd.Series(['Itemized' for _ in plan.cal_year],index=plan.cal_year)],axis=1).rename(columns={0:'amt',1:'name'})
-      fed_standard_deduction = pd.concat([fed_infl['deductions']['standard_deduction'][tax_filing],pd.Series(['Standard' for _ in plan.cal_year],index=plan.cal_year)],axis=1).rename(columns={0:'amt',1:'name'})  
-      # print(fed_standard_deduction)
-      all_fed_deductions = pd.concat([fed_standard_deduction,fed_itemized_deductions]).reset_index(drop=False)
-      fed_deduction = all_fed_deductions.groupby("index").agg({'amt':['idxmax','max']}).droplevel(0,axis=1).merge(all_fed_deductions[['index','name']],left_on='idxmax',right_index=True).drop(['idxmax','index'],axis=1).rename(columns={'max':'amt'})
-      fed_taxable_income = adjusted_gross_income-fed_deduction["amt"]
-      fed_taxable_income = fed_taxable_income.apply(lambda x: max(x,0))
-      fed_income_tax = apply_tax_series(fed_taxable_income,fed_infl['tax']['brackets'][tax_filing],fed_infl['tax']['rates'][tax_filing])
-      
-      
-      # Any Federal Tax credits - Childcare and Dependent Care Has Been Handled Above
-      # Child Tax credit
-      # This is partially refundable as of 2024, but it's complicated and frankly unlikely that we would need it
-      #qualifying_children = [[1 if ((age < 18) and (age >= 0)) else 0 for age in person.age] for person in plan.people if person.dependent == True]
-      #qualifying_children = pd.Series([sum(x) for x in zip(*qualifying_children)],index=plan.cal_year)
-      qualifying_children = plan.dependents
-      child_credit_max = qualifying_children*fed_infl['credits']['child_max'][tax_filing]*joint_exp_multi
-      child_credit = pd.DataFrame({'I':modified_adjusted_gross_income,'M':child_credit_max,'L':fed_infl['credits']['child_limit'][tax_filing],'R':fed_infl['credits']['child_phaseout_rate'][tax_filing]})
-      child_credit = child_credit.apply(lambda x : x.M if x.I <= x.L else x.M - x.R*(x.I-x.L) if x.L < x.I <= x.L + (1/x.R)*x.M else 0,axis=1)   
-      fed_tax_credits.append(child_credit)
-
-      # Lifelong Learning Credit
-  
-      # ---- Not as Applicable
-      # Savers Credit, American Opportunity Credit, Earned Income Tax Credit
-  
-      if len(fed_tax_credits)==0:
-        fed_tax_credits.append(pd.Series([0 for _ in plan.cal_year],index=plan.cal_year))
-      
-      fed_tax_credits = sum(fed_tax_credits)
-      fed_income_tax = fed_income_tax - fed_tax_credits
-      #
-      # Currently, no excess tax credits are returned, though this should be cheked
-      fed_income_tax = fed_income_tax.apply(lambda x: max(x,0))
-  
-      # COMPUTE TOTAL INCOME TAX
-      income_tax = fed_income_tax+state_income_tax
-  
-      # SOCIAL SECURITY AND MEDICARE TAXES (PAYROLL TAXES)
-      # SS & MED Income (Only Health Insurance Premiums Deducted Right Now)
-      if len([obj for obj in plan.get_tax_keyword_objects('Health Insurance') if obj.person in filers]) > 0:
-        ssm_pretax_deductions = [obj for obj in plan.get_tax_keyword_objects("Health Insurance") if obj.person in filers]
-        ssm_pretax_deductions = sum([obj.value*joint_exp_multi if obj.person=='Joint' else obj.value for obj in ssm_pretax_deductions])
-      else:
-        ssm_pretax_deductions = pd.Series([0 for _ in plan.cal_year],index=plan.cal_year)
-      ssm_income = gross_taxable_income-ssm_pretax_deductions
+  # Tax tables are only looked up (and a jurisdiction loaded) if one of its filers has to be recomputed
+  pending = [scenario for scenario in scenarios if scenario[4] is None]
+  if len(pending) > 0:
+    tax_tables = [get_tax_tables(plan,filer_jurisdiction(plan,scenario[1])) for scenario in pending]
+    def run(scenario,scenario_tables):
+      return(calculate_filer_tax(plan,scenario[0],scenario[1],scenario_tables,all_payroll_tax_names))
+    workers = TAX_WORKERS if workers is None else workers
+    if workers > 1 and len(pending) > 1:
+      with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(run,pending,tax_tables))
+    else:
+      results = [run(scenario,scenario_tables) for scenario, scenario_tables in zip(pending,tax_tables)]
+    for scenario, result in zip(pending,results):
+      scenario[4] = result
   
-      # Soc. Security
-      ss_tax = ssm_income*fed_infl['tax']['social_security_rate'][tax_filing]
+  for tax_filing, filers, key, inputs, (filer_name, tax_df) in scenarios:
+    plan._tax_cache[key] = (inputs,(filer_name,tax_df))
+    tax_df_dict[tax_filing] |= {filer_name:tax_df}
+  return(tax_df_dict)
+
+def calculate_filer_tax(plan,tax_filing,filers,tax_tables,all_payroll_tax_names):
+  """
+  Calculate income and payroll taxes for one set of filers under one filing status.
   
-      # Medicare
-      medicare_tax = ssm_income*fed_infl['tax']['medicare_rate'][tax_filing]
-
-      # Additional payroll taxes configured on salary income objects
-      payroll_tax_breakdown = {
-        'payroll_tax:Social Security': ss_tax,
-        'payroll_tax:Medicare': medicare_tax
-      }
-      for tax_name in all_payroll_tax_names:
-        payroll_tax_breakdown[f'payroll_tax:{tax_name}'] = pd.Series([0 for _ in plan.cal_year],index=plan.cal_year)
-      for obj in plan.income:
-        if ((obj.person in filers) and (obj.subcategory == 'Salary') and (obj.taxable == True)):
-          if hasattr(obj, 'payroll_taxes') and obj.payroll_taxes:
-            for payroll_tax in obj.payroll_taxes:
-              tax_name = payroll_tax.get('name', '').strip()
-              rate = payroll_tax.get('rate', 0)
-              if tax_name != '' and rate:
-                payroll_tax_breakdown[f'payroll_tax:{tax_name}'] += obj.value * rate
-
-      # Totals
-      payroll_tax = sum(payroll_tax_breakdown.values())
-      total_tax = income_tax + payroll_tax
+  Args:
+      tax_tables: TaxTables for the filers' jurisdiction and the plan's calendar and inflation
+                  (see get_tax_tables, filer_jurisdiction)
   
-      ########  
+  Returns:
+      [filer_name, tax_df]
+  """
+  fed_infl = tax_tables.fed
+  state_infl = tax_tables.state
+  if tax_filing == 'joint': 
+    joint_exp_multi = 1
+  else:
+    joint_exp_multi = 0.5
   
-      #Make a Summary Dataframe...https://taxfoundation.org/taxedu/glossary/adjusted-gross-income-agi/
-      if tax_filing == 'joint':
-        filer_name = 'Joint'
+
+  # Gross Taxable Income
+  gross_taxable_income = sum([obj.value for obj in plan.income if ((obj.taxable==True) and (obj.person in filers))])
+  if isinstance(gross_taxable_income,(float,int)):
+      if gross_taxable_income == 0:
+          gross_taxable_income = pd.Series(0,index=plan.cal_year)
+  # ABOVE - THE - LINE DEDUCTIONS
+  # Retirment / HSA Accounts:
+  # Cannot be jointly held, and thus have individual limits (which have already been enforced)    
+
+  pretax_deductions = sum([obj.value for obj in plan.get_tax_keyword_objects(['Traditional','HSA']) if (obj.person in filers)])
+
+  # Modifed Adjusted Gross Income (MAGI)
+  modified_adjusted_gross_income = gross_taxable_income - pretax_deductions
+
+  # Student Loan Interest Deduction
+  # Phases out at higher incomes...haven't bothered with this yet
+
+  student_loan_interest = sum([obj.interest_payment_annual for obj in plan.get_tax_keyword_objects("Student Loan") if (obj.person in filers)])
+  if isinstance(student_loan_interest,int):
+      if student_loan_interest == 0:
+          student_loan_interest = pd.Series([0 for _ in range(len(plan.cal_year))],index=plan.cal_year)
       else:
-        filer_name = filers[0]
-      tax_df = pd.DataFrame({'filer':filer_name,
-                'gross_income':gross_taxable_income,
-                'MAGI':modified_adjusted_gross_income,
-                'AGI':adjusted_gross_income,
-                'fed_deduction':fed_deduction['amt'],
-                'fed_deduction_name':fed_deduction['name'],
-                'fed_income_tax':fed_income_tax,
-                'state_deduction':state_deduction['amt'],
-                'state_deduction_name':state_deduction['name'],
-                'state_income_tax':state_income_tax,
-                'payroll_tax':payroll_tax,
-                'total_tax':total_tax})
-      for payroll_key, payroll_series in payroll_tax_breakdown.items():
-        tax_df[payroll_key] = payroll_series
-      # print(tax_df.head(5))
-      tax_df_dict[tax_filing] |= {filer_name:tax_df}
-  return(tax_df_dict)
+          print('Error - Summing Student Loan Interest')
+  else:
+     student_loan_interest = pd.concat([student_loan_interest,fed_infl['deductions']['student_loan_max'][tax_filing]], axis=1).min(axis=1) 
+     student_loan_interest[fed_infl['deductions']['student_loan_magi_thresh'] <= modified_adjusted_gross_income] = 0
+
+  # Adjusted Gross Income (AGI)
+  adjusted_gross_income = modified_adjusted_gross_income-student_loan_interest
+
+  ### BELOW - THE - LINE DEDUCTIONS
+  # One difficulty with this is the SALT itemized deduction requires requires the computation of 
+  # state taxes before it can be determined whether or not to itemize for federal...can this be correct?
+
+  #Itemized Deductions (common)
+  fed_itemized_deductions = []
+  state_itemized_deductions = []
+
+  # Mortgage interest on up to two homes, and points
+  # Will need to look at this for multiple houses, when figuring deductible interest is much trickier
+  if len([obj for obj in plan.get_tax_keyword_objects('Mortgage') if obj.person in filers]) > 0:
+    mortgage_rate = plan.get_tax_keyword_objects('Mortgage')[0].interest_rate
+    mortgage_interest = sum([obj.interest_payment_annual*joint_exp_multi if obj.person=='Joint' else obj.interest_payment_annual for obj in plan.get_tax_keyword_objects('Mortgage')]) #trivial sum
+    #
+    fed_itemized_deductions.append(pd.concat([mortgage_interest,fed_infl['deductions']['mortgage_limit'][tax_filing]*mortgage_rate], axis=1).min(axis=1))
+    state_itemized_deductions.append(pd.concat([mortgage_interest,state_infl['deductions']['mortgage_limit'][tax_filing]*mortgage_rate], axis=1).min(axis=1))
+
+  # Property taxes inf state limit, 10k federal limit (combined with state taxes)
+  if len([obj for obj in plan.get_tax_keyword_objects('Property Tax') if obj.person in filers]) > 0:
+    property_tax = plan.get_tax_keyword_objects('Property Tax')[0].value
+    if plan.get_tax_keyword_objects('Property Tax')[0].person=='Joint':
+        property_tax = property_tax*joint_exp_multi
+    state_itemized_deductions.append(pd.concat([property_tax,state_infl['deductions']['property_tax_max'][tax_filing]], axis=1).min(axis=1))
+  else:
+    property_tax = pd.Series([0 for _ in plan.cal_year],index=plan.cal_year) #Makes calculating SALT easier
+
+  # Medical and dental expenses that exceed 7.5% of your adjusted gross income,
+  if len([obj for obj in plan.get_tax_keyword_objects('Medical') if obj.person in filers]) > 0:
+    medical_expenses = [obj for obj in plan.get_tax_keyword_objects("Medical") if obj.person in filers]
+    medical_expenses = sum([obj.value*joint_exp_multi if obj.person=='Joint' else obj.value for obj in medical_expenses])
+    #
+    fed_itemized_deductions.append(pd.concat([medical_expenses,adjusted_gross_income*fed_infl['deductions']['medical_limit_rate']], axis=1).min(axis=1))
+    state_itemized_deductions.append(pd.concat([medical_expenses,adjusted_gross_income*state_infl['deductions']['medical_limit_rate']], axis=1).min(axis=1))
+
+  # Charitable donations 
+  if len([obj for obj in plan.get_tax_keyword_objects('Charitable Donations') if obj.person in filers]) > 0:
+    charitable_donations = [obj for obj in plan.get_tax_keyword_objects("Charitable Donations") if obj.person in filers]
+    charitable_donations = sum([obj.value*joint_exp_multi if obj.person=='Joint' else obj.value for obj in charitable_donations])
+    #
+    fed_itemized_deductions.append(pd.concat([charitable_donations,adjusted_gross_income*fed_infl['deductions']['charity_limit_rate']], axis=1).min(axis=1))
+    state_itemized_deductions.append(pd.concat([charitable_donations,adjusted_gross_income*state_infl['deductions']['charity_limit_rate']], axis=1).min(axis=1))
+
+  # State and Local income or sales Taxes (SALT - Federal Only)
+  # Since state income tax may be deductible, we compute it here...which is annoying
+  # I could alternatively use withholding, but it's not an easy formula
+
+  if len(state_itemized_deductions)==0:
+    state_itemized_deductions = pd.Series([0 for _ in plan.cal_year],index=plan.cal_year)
+  elif len(state_itemized_deductions) > 0:
+    state_itemized_deductions = sum(state_itemized_deductions)
+  state_deduction = choose_deduction(state_infl['deductions']['standard_deduction'][tax_filing],state_itemized_deductions)
+  state_taxable_income = adjusted_gross_income-state_deduction["amt"]
+  state_taxable_income = clamp_at_zero(state_taxable_income)
+  state_income_tax = tax_tables.apply_tax('state',tax_filing,state_taxable_income)
+
+
+  # Apply Any Tax Credits... Childcare Tax Credit is the only CA one I see as relevant right now
+  state_tax_credits = []
+  fed_tax_credits = []
+
+  # Child and Dependent Care Credit 
+  if (tax_filing != 'separate') & len([obj for obj in plan.get_tax_keyword_objects('Child or Dependent Care') if obj.person in filers]) > 0:
+    child_dependent_care_expenses = [obj for obj in plan.get_tax_keyword_objects('Child or Dependent Care') if obj.person in filers]
+    child_dependent_care_expenses = sum([obj.value*joint_exp_multi if obj.person=='Joint' else obj.value for obj in child_dependent_care_expenses])
+    qualifying_dependents = [[1 if ((age < 13) and (age >= 0)) else 0 for age in person.age] for person in plan.people if person.dependent == True]
+    qualifying_dependents = pd.Series([sum(x) for x in zip(*qualifying_dependents)],index=plan.cal_year)
+
+    fed_child_dependent_care_eff_multi, fed_child_dependent_care_eff_max = dependent_care_terms(tax_tables,'fed',tax_filing,adjusted_gross_income,qualifying_dependents,plan.cal_year)
+    fed_child_dependent_care_amt = fed_child_dependent_care_eff_multi*child_dependent_care_expenses
+    fed_child_dependent_care_credit = pd.concat([fed_child_dependent_care_amt,fed_child_dependent_care_eff_max], axis=1).min(axis=1) 
+    fed_tax_credits.append(fed_child_dependent_care_credit)
+
+    # State credit currently based off federal for parsimony...
+    state_child_dependent_care_eff_multi, state_child_dependent_care_eff_max = dependent_care_terms(tax_tables,'state',tax_filing,adjusted_gross_income,qualifying_dependents,plan.cal_year)
+    state_child_dependent_care_amt = state_child_dependent_care_eff_multi*child_dependent_care_expenses
+    state_child_dependent_care_credit = pd.concat([state_child_dependent_care_amt,state_child_dependent_care_eff_max], axis=1).min(axis=1) 
+    state_tax_credits.append(state_child_dependent_care_credit)
+
+  # CA Exemption:
+  state_tax_credits.append(state_infl['credits']['exemption'][tax_filing])    
+
+  # CA has a child tax credit, but must qualify for earned income tax credit
+  # Total state credits and compute tax 
+  if len(state_tax_credits)==0:
+      state_tax_credits.append(pd.Series([0 for _ in plan.cal_year],index=plan.cal_year))
+
+  state_tax_credits = sum(state_tax_credits)
+  state_income_tax = state_income_tax - state_tax_credits
+  # Currently no excess credit is returned:
+  state_income_tax = clamp_at_zero(state_income_tax)
+
+  # Back to Federal...
+  # SALT (State and Local Tax) Deduction
+  SALT = pd.concat([fed_infl['deductions']['SALT_max'][tax_filing],(state_income_tax+property_tax)], axis=1).min(axis=1) 
+  fed_itemized_deductions.append(SALT)
+
+  # Compute federal deduction:
+
+  if len(fed_itemized_deductions)==0:
+    fed_itemized_deductions = pd.Series([0 for _ in plan.cal_year],index=plan.cal_year)
+  elif len(fed_itemized_deductions) > 0:
+    fed_itemized_deductions = sum(fed_itemized_deductions)
+  fed_deduction = choose_deduction(fed_infl['deductions']['standard_deduction'][tax_filing],fed_itemized_deductions)
+  fed_taxable_income = adjusted_gross_income-fed_deduction["amt"]
+  fed_taxable_income = clamp_at_zero(fed_taxable_income)
+  fed_income_tax = tax_tables.apply_tax('fed',tax_filing,fed_taxable_income)
+
+
+  # Any Federal Tax credits - Childcare and Dependent Care Has Been Handled Above
+  # Child Tax credit
+  # This is partially refundable as of 2024, but it's complicated and frankly unlikely that we would need it
+  #qualifying_children = [[1 if ((age < 18) and (age >= 0)) else 0 for age in person.age] for person in plan.people if person.dependent == True]
+  #qualifying_children = pd.Series([sum(x) for x in zip(*qualifying_children)],index=plan.cal_year)
+  qualifying_children = plan.dependents
+  child_credit_max = qualifying_children*fed_infl['credits']['child_max'][tax_filing]*joint_exp_multi
+  child_credit = child_tax_credit(modified_adjusted_gross_income,child_credit_max,fed_infl['credits']['child_limit'][tax_filing],fed_infl['credits']['child_phaseout_rate'][tax_filing])
+  fed_tax_credits.append(child_credit)
+
+  # Lifelong Learning Credit
+
+  # ---- Not as Applicable
+  # Savers Credit, American Opportunity Credit, Earned Income Tax Credit
+
+  if len(fed_tax_credits)==0:
+    fed_tax_credits.append(pd.Series([0 for _ in plan.cal_year],index=plan.cal_year))
+
+  fed_tax_credits = sum(fed_tax_credits)
+  fed_income_tax = fed_income_tax - fed_tax_credits
+  #
+  # Currently, no excess tax credits are returned, though this should be cheked
+  fed_income_tax = clamp_at_zero(fed_income_tax)
+
+  # COMPUTE TOTAL INCOME TAX
+  income_tax = fed_income_tax+state_income_tax
+
+  # SOCIAL SECURITY AND MEDICARE TAXES (PAYROLL TAXES)
+  # SS & MED Income (Only Health Insurance Premiums Deducted Right Now)
+  if len([obj for obj in plan.get_tax_keyword_objects('Health Insurance') if obj.person in filers]) > 0:
+    ssm_pretax_deductions = [obj for obj in plan.get_tax_keyword_objects("Health Insurance") if obj.person in filers]
+    ssm_pretax_deductions = sum([obj.value*joint_exp_multi if obj.person=='Joint' else obj.value for obj in ssm_pretax_deductions])
+  else:
+    ssm_pretax_deductions = pd.Series([0 for _ in plan.cal_year],index=plan.cal_year)
+  ssm_income = gross_taxable_income-ssm_pretax_deductions
+
+  # Soc. Security
+  ss_tax = ssm_income*fed_infl['tax']['social_security_rate'][tax_filing]
+
+  # Medicare
+  medicare_tax = ssm_income*fed_infl['tax']['medicare_rate'][tax_filing]
+
+  # Additional payroll taxes configured on salary income objects
+  payroll_tax_breakdown = {
+    'payroll_tax:Social Security': ss_tax,
+    'payroll_tax:Medicare': medicare_tax
+  }
+  for tax_name in all_payroll_tax_names:
+    payroll_tax_breakdown[f'payroll_tax:{tax_name}'] = pd.Series([0 for _ in plan.cal_year],index=plan.cal_year)
+  for obj in plan.income:
+    if ((obj.person in filers) and (obj.subcategory == 'Salary') and (obj.taxable == True)):
+      if hasattr(obj, 'payroll_taxes') and obj.payroll_taxes:
+        for payroll_tax in obj.payroll_taxes:
+          tax_name = payroll_tax.get('name', '').strip()
+          rate = payroll_tax.get('rate', 0)
+          if tax_name != '' and rate:
+            payroll_tax_breakdown[f'payroll_tax:{tax_name}'] += obj.value * rate
+
+  # Totals
+  payroll_tax = sum(payroll_tax_breakdown.values())
+  total_tax = income_tax + payroll_tax
+
+  ########  
+
+  #Make a Summary Dataframe...https://taxfoundation.org/taxedu/glossary/adjusted-gross-income-agi/
+  if tax_filing == 'joint':
+    filer_name = 'Joint'
+  else:
+    filer_name = filers[0]
+  tax_df = pd.DataFrame({'filer':filer_name,
+            'gross_income':gross_taxable_income,
+            'MAGI':modified_adjusted_gross_income,
+            'AGI':adjusted_gross_income,
+            'fed_deduction':fed_deduction['amt'],
+            'fed_deduction_name':fed_deduction['name'],
+            'fed_income_tax':fed_income_tax,
+            'state_deduction':state_deduction['amt'],
+            'state_deduction_name':state_deduction['name'],
+            'state_income_tax':state_income_tax,
+            'payroll_tax':payroll_tax,
+            'total_tax':total_tax})
+  for payroll_key, payroll_series in payroll_tax_breakdown.items():
+    tax_df[payroll_key] = payroll_series
+  # print(tax_df.head(5))
+  return([filer_name,tax_df])
 
 # After all income has been taxed, and all expenses have been paid, the leftover
 # money will be put into savings. At some point, the 'bucket filling' allocation of
@@ -373,7 +631,140 @@ def calculate_income_and_payroll_tax(plan):
 # Split Expenses
 # Marriage
 
-def balance_and_tax(plan):
+def get_balance_inputs(person_accts,difference):
+    """
+    Snapshot of what a person's balance loop reads: the income - expenses difference and
+    the drawdown accounts after their contributions are reset.
+    
+    Returns None if the accounts can't be rebalanced incrementally (sold assets in the
+    drawdown order are changed by the loop in ways a restart can't restore; liabilities are
+    left out of balancing, see Plan.drawdown_assets).
+    """
+    if any([obj.obj_type != 'Asset' or getattr(obj,'sold',0) != 0 for obj in person_accts]):
+        return(None)
+    accts = {obj.id:{key:val for key, val in obj.__dict__.items() if key[0] != '_' and key != 'contribution'} for obj in person_accts}
+    return(deepcopy({'difference':difference,'accounts':accts}))
+
+def get_balance_start_year(plan,person,inputs):
+    """
+    First year a person's balance has to be rerun from, given the inputs of this run.
+    
+    Balances are sequential but causal: the loop for a year only reads that year's
+    difference and account values, which depend on earlier years only. If nothing
+    before year Y changed since the last balance, the last balance's contributions
+    before Y still hold and the loop can restart at Y.
+    """
+    first_year = int(plan.cal_year.iloc[0])
+    if inputs is None or person not in plan._balance_cache:
+        return(first_year)
+    year = utils.utilities.first_changed_year(plan._balance_cache[person]['inputs'],inputs,plan.cal_year)
+    if year is None:
+        return(int(plan.cal_year.iloc[-1])+1)
+    return(year)
+
+def best_filing_tax_df(tax_df_dict,married):
+    """
+    Tax rows of the cheapest filing status in each year, as plan.tax_df.
+    
+    Builds a (years x filing statuses) matrix of total tax, summed over each status' filers,
+    masks the statuses a year can't use ('single' while unmarried, 'joint' and 'separate'
+    while married) and takes the first minimum per year, so ties go to the earlier status
+    in tax_df_dict. The chosen rows are gathered from all scenarios in one step, ordered by
+    year and then filer.
+    """
+    statuses = list(tax_df_dict.keys())
+    full_tax_df = pd.concat([tax_df.assign(filing_status = filing_status) for filing_status in statuses for tax_df in tax_df_dict[filing_status].values()])
+    years = pd.Index(married.index)
+    # Missing years and all-NaN totals stay NaN and are skipped like idxmin skips them
+    totals = np.full((len(years),len(statuses)),np.nan)
+    for j, filing_status in enumerate(statuses):
+        filer_dfs = list(tax_df_dict[filing_status].values())
+        if len(filer_dfs) == 1:
+            total = filer_dfs[0]['total_tax']
+        else:
+            # A groupby sum over the filers' years: NaN counts as 0
+            total = pd.concat([tax_df['total_tax'] for tax_df in filer_dfs]).groupby(level=0).sum()
+        totals[:,j] = total.reindex(years).to_numpy(dtype=float)
+    is_married = married.to_numpy(dtype=bool)
+    allowed = np.array([[(filing_status == 'single') != m for filing_status in statuses] for m in is_married]).reshape(len(years),len(statuses))
+    totals = np.where(allowed,totals,np.nan)
+    has_total = ~np.isnan(totals).all(axis=1)
+    best = np.argmin(np.where(np.isnan(totals),np.inf,totals),axis=1)
+    # Gather: a row is kept if its year has a best status and the row belongs to it
+    year_pos = years.get_indexer(full_tax_df.index)
+    status_pos = pd.Index(statuses).get_indexer(full_tax_df['filing_status'])
+    keep = (year_pos >= 0)
+    keep[keep] = has_total[year_pos[keep]] & (best[year_pos[keep]] == status_pos[keep])
+    rows = np.flatnonzero(keep)
+    rows = rows[np.argsort(year_pos[rows],kind='stable')]
+    return(full_tax_df.iloc[rows])
+
+# Balancing
+# | Each year's surplus is contributed to the person's first drawdown account and each deficit
+# | is drawn down through the accounts in order (Plan.drawdown). balance_by_year does this one
+# | year at a time, re-projecting the touched account after every year. balance_accounts makes
+# | the same decisions with all surpluses contributed up front (they don't depend on account
+# | values) and all deficits drawn down together by Plan.drawdown_years, which follows each
+# | account's compound recurrence (AssetObj.compound_value) instead of projecting it.
+
+# Draw deficits down with Plan.drawdown_years (False always runs the per-year loop)
+BALANCE_SOLVER = True
+
+def balance_by_year(plan,person,difference,start_year,accounts=None):
+    """
+    Balance a person's accounts one year at a time, projecting after each year's change.
+    Deficits are drawn down through accounts (defaults to the person's drawdown order).
+    """
+    # Loop over years, reproject savings accts each time (computationally cheap)
+    for yr in plan.cal_year:
+        if yr < start_year:
+            continue
+        amt = difference[yr]
+        if amt >= 0.0:
+            # Guard: if no savings accounts configured for this person, skip deposit
+            if person not in plan.drawdown_order or len(plan.drawdown_order[person]) == 0:
+                pass
+            else:
+                first_id = plan.drawdown_order[person][0]
+                first_obj = plan.get_object_from_id(first_id)
+                if first_obj is None or first_obj.obj_type == 'Liability':
+                    # No eligible savings account found
+                    pass
+                else:
+                    first_obj.contribution[yr] += int(amt)
+                    plan = first_obj.project(plan)
+        else:
+            plan = plan.drawdown(amt,yr,person,accounts=accounts)
+    return(plan)
+
+def balance_accounts(plan,person,difference,start_year,accounts=None):
+    """
+    Balance a person's accounts from start_year on, as balance_by_year does.
+    
+    Surpluses only depend on the difference, so they are all contributed to the first drawdown
+    account, which is projected once. The deficits are then drawn down together through accounts
+    (defaults to the person's drawdown order) with Plan.drawdown_years, which falls back to
+    Plan.drawdown year by year where it doesn't apply.
+    """
+    if not BALANCE_SOLVER:
+        return(balance_by_year(plan,person,difference,start_year,accounts))
+    drawdown_list = plan.drawdown_order.get(person,[])
+    if len(drawdown_list) == 0:
+        return(plan)
+    years = [yr for yr in plan.cal_year if yr >= start_year]
+    first_obj = plan.get_object_from_id(drawdown_list[0])
+    if first_obj is not None and first_obj.obj_type != 'Liability':
+        surplus = [yr for yr in years if difference[yr] >= 0.0]
+        for yr in surplus:
+            first_obj.contribution[yr] += int(difference[yr])
+        if len(surplus) > 0:
+            plan = first_obj.project(plan)
+    deficit = difference[[yr for yr in years if difference[yr] < 0.0]]
+    if len(deficit) > 0:
+        plan = plan.drawdown_years(deficit,person,accounts=accounts)
+    return(plan)
+
+def balance_and_tax(plan,incremental=False):
     """
     Main balance and tax calculation process.
     
@@ -382,6 +773,8 @@ def balance_and_tax(plan):
     
     Args:
         plan: The plan object to balance and tax
+        incremental: If True, restart each person's balance at the first year
+                     whose inputs changed since the last balance (see get_balance_start_year)
         
     Returns:
         Updated plan object with taxes and balanced cash flow
@@ -408,38 +801,10 @@ def balance_and_tax(plan):
     plan.expenses = [exp for exp in plan.expenses if ((exp.category != 'Tax') | (exp.subcategory not in ['Income','Payroll']))]
 
     # This is about determining the best tax filing scenario
-    total_tax_list = []
-    full_tax_list = []
-
-    for filing_status in plan.tax_df_dict.keys():
-    # First, append all dfs in tax_df_dict[filing_status]
-        for filer in plan.tax_df_dict[filing_status].keys():
-            full_tax_list.append(plan.tax_df_dict[filing_status][filer].assign(filing_status = filing_status))
-    #
-        if len(plan.tax_df_dict[filing_status].keys())==2:
-            temp = pd.concat(plan.tax_df_dict[filing_status].values()).reset_index(drop=False).loc[:,['index','total_tax']].groupby('index').sum()
-        else:
-            temp = pd.concat(plan.tax_df_dict['joint'].values()).loc[:,['total_tax']]
-        temp.loc[:,'filing_status'] = filing_status
-        total_tax_list.append(temp)
-  #
-    full_tax_df  = pd.concat(full_tax_list)
-    #
-    total_tax_df = pd.concat(total_tax_list).reset_index(drop=False)
-    single_df = total_tax_df.loc[total_tax_df['index'].isin(list(plan.married.index[~plan.married])) & total_tax_df['filing_status'].isin(['single']),:]
-    married_df = total_tax_df.loc[total_tax_df['index'].isin(list(plan.married.index[plan.married])) & total_tax_df['filing_status'].isin(['joint','separate']),:]
-    total_tax_df = pd.concat([single_df,married_df]).reset_index(drop=True)        
-    total_tax_sorted = total_tax_df.groupby("index").agg({'total_tax':['idxmin','min']}).droplevel(0,axis=1) #.merge(all_state_deductions[['index','name']],left_on='idxmax',right_index=True).drop(['idxmax','index'],axis=1).rename(columns={'max':'amt'})
-    best_filing_status = total_tax_df.reset_index(drop=False).loc[total_tax_sorted['idxmin'],['index','filing_status']].set_index('index')
-    
-    best_tax_df = []
-    for yr in best_filing_status.index:
-        best_tax_df.append(full_tax_df.loc[(full_tax_df.index==yr)&(full_tax_df['filing_status']==best_filing_status.loc[yr,'filing_status'])])
-      
-    plan.tax_df = pd.concat(best_tax_df)
+    plan.tax_df = best_filing_tax_df(plan.tax_df_dict,plan.married)
   
-    # Create Tax Expense Objects
-
+    # Create Tax Expense Objects (projected together below)
+    tax_exps = []
     for filer in plan.tax_df.filer.unique():
         for col, name in {'state_income_tax':['Income','State'],'fed_income_tax':['Income','Federal']}.items():
             tax_series = plan.tax_df.loc[plan.tax_df['filer']==filer, col]
@@ -449,7 +814,7 @@ def balance_and_tax(plan):
                               tax_series,
                               True,False)
             plan.expenses.append(exp)
-            plan = exp.project(plan)
+            tax_exps.append(exp)
 
         payroll_cols = [col for col in plan.tax_df.columns if col.startswith('payroll_tax:')]
         for col in payroll_cols:
@@ -461,17 +826,22 @@ def balance_and_tax(plan):
                               tax_series,
                               True,False)
             plan.expenses.append(exp)
-            plan = exp.project(plan)
+            tax_exps.append(exp)
+    plan = plan.project_objects(tax_exps)
 
   
     # Loop of people, years to contribute to or draw down a savings account
     # print('Getting into Person Loop on Balance')
     for person in adults:
         # First, clear all contributions from drawdown items
-        for acct in plan.drawdown_order[person]:
+        # Liabilities in the drawdown order are skipped (warned about once per balance)
+        accounts = plan.drawdown_assets(plan.drawdown_order[person])
+        reset_accts = []
+        for acct in accounts:
             obj = plan.get_object_from_id(acct)
             obj.contribution = pd.Series(0,index=obj.cal_year)
-            plan = obj.project(plan)
+            reset_accts.append(obj)
+        plan = plan.project_objects(reset_accts)
         # NOTE: This reset clears prior auto-balancing contributions
         
         # Sum all expense components for this person
@@ -497,31 +867,32 @@ def balance_and_tax(plan):
         # print('Total Difference: ',difference[2024])
         # Debug prints removed after verification
         
-        # Loop over years, reproject savings accts each time (computationally cheap)
-        # If 
-        for yr in plan.cal_year:
-            amt = difference[yr]
-            if amt >= 0.0:
-                # Guard: if no savings accounts configured for this person, skip deposit
-                if person not in plan.drawdown_order or len(plan.drawdown_order[person]) == 0:
-                    pass
-                else:
-                    first_id = plan.drawdown_order[person][0]
-                    first_obj = plan.get_object_from_id(first_id)
-                    if first_obj is None or first_obj.obj_type == 'Liability':
-                        # No eligible savings account found
-                        pass
-                    else:
-                        first_obj.contribution[yr] += int(amt)
-                        plan = first_obj.project(plan)
-            else:
-                plan = plan.drawdown(amt,yr,person)
+        # Restore the last balance's contributions for years that don't need rebalancing
+        balance_inputs = get_balance_inputs(reset_accts,difference)
+        if incremental:
+            start_year = get_balance_start_year(plan,person,balance_inputs)
+        else:
+            start_year = int(plan.cal_year.iloc[0])
+        if start_year > int(plan.cal_year.iloc[0]):
+            contributions = plan._balance_cache[person]['contributions']
+            for obj in reset_accts:
+                obj.contribution = contributions[obj.id].where(contributions[obj.id].index < start_year,0)
+            plan = plan.project_objects(reset_accts)
+        
+        # Contribute surpluses and draw down deficits from start_year on
+        plan = balance_accounts(plan,person,difference,start_year,accounts)
+        
+        if balance_inputs is not None:
+            plan._balance_cache[person] = {'inputs':balance_inputs,
+                                           'contributions':{obj.id:obj.contribution.copy() for obj in reset_accts}}
+        else:
+            plan._balance_cache.pop(person,None)
       #plan = plan.project_all()
 
     #Lastly, compute analytical timeseries
     df_list = []
     for person in adults+['Joint']:
-        df = utils.plotting.compute_analytical_timeseries(plan, person)
+        df = utils.tables.compute_analytical_timeseries(plan, person)
         df['person'] = person
         df_list.append(df)
     plan.analytical_timeseries = pd.concat(df_list)
@@ -152,9 +152,11 @@ def open_object_viewer():
         return
     series_attrs = {k:v for k,v in obj.__dict__.items() if isinstance(v,pd.Series) and k != 'cal_year'}
     attr_rows = []
-    for key, value in obj.__dict__.items():
+    for key in list(obj.__dict__):
         if key.startswith('_') or key == 'cal_year':
             continue
+        # Loads attributes a lazy load deferred (objs.deferred)
+        value = getattr(obj,key)
         if isinstance(value,pd.Series):
             continue
         if isinstance(value,pd.DataFrame):
@@ -217,11 +219,11 @@ def save_plan():
     target_path = f"saved_plans/{plan_name}.json"
     temp_path = f"{target_path}.tmp"
     try:
-        payload = st.session_state['plan'].to_json_string()
-        if payload is None or payload.strip() == '':
-            raise ValueError("Plan serialization produced empty JSON.")
+        # Stream the plan straight to the file rather than building the JSON string first
         with open(temp_path, 'w') as out:
-            out.write(payload)
+            st.session_state['plan'].write_json(out)
+            if out.tell() == 0:
+                raise ValueError("Plan serialization produced empty JSON.")
         os.replace(temp_path, target_path)
         st.session_state['plan_saved'] = True
     except Exception as exc:
@@ -229,6 +231,9 @@ def save_plan():
             os.remove(temp_path)
         st.error(f"Save failed: {exc}")
 
+# Set to True to check every incremental recompute against a full one (slow)
+CHECK_INCREMENTAL_RECOMPUTE = False
+
 def update_plan():
     """
     Update the plan by processing events and running balance/tax calculations.
@@ -236,7 +241,7 @@ def update_plan():
     This is the main workhorse function that:
     1. Processes marriage events
     2. Processes expense combination events  
-    3. Runs balance and tax calculations
+    3. Runs balance and tax calculations, incrementally (Plan.recompute)
     """
     # Apply marriage events first (sets married series and applies budget withdrawals)
     for ev in st.session_state['plan'].events:
@@ -268,7 +273,7 @@ def update_plan():
             st.session_state['plan'].events[i][0] = year
             st.session_state['plan'] = st.session_state['plan'].combine_expenses(names, year)
     # Then compute balance and taxes
-    st.session_state['plan'] = st.session_state['plan'].balance_and_tax()
+    st.session_state['plan'] = st.session_state['plan'].recompute(check=CHECK_INCREMENTAL_RECOMPUTE)
     st.session_state['plan_updated'] = True
 
 